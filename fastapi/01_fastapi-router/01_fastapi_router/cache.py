@@ -0,0 +1,31 @@
+# Responses already encoded to JSON bytes, reused until the data they were built from changes.
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class ResponseCache:
+    """LRU of key -> (version, body). A body is only served for the version it was built from,
+    so a write invalidates it just by bumping the version."""
+
+    def __init__(self, maxsize : int = 10_000):
+        self.maxsize = maxsize
+        self.entries : OrderedDict[Hashable, tuple[int, bytes]] = OrderedDict()
+
+    def get(self, key : Hashable, version : int)-> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != version:
+            del self.entries[key] # stale
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key : Hashable, version : int, body : bytes)-> None:
+        self.entries[key] = (version, body)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key : Hashable)-> None:
+        self.entries.pop(key, None)
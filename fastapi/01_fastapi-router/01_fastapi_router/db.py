@@ -1,12 +1,302 @@
 # a dumb Database for testing
-from schemas.Book import Book
-from pydantic import BaseModel,Field
+from schemas.Book import Book,BookCreate,Categories,CategoryStats
+from persistence import BookLog
+from store import BookStore
+from search import SearchIndex
+from stats import InventoryStats
+from pydantic import BaseModel,ConfigDict,Field,PrivateAttr
+from typing import Callable,Optional,Protocol
+from itertools import islice
+import os
+import threading
+import uuid
+
+
+LOAD_BATCH = 50_000 # books put at a time by open_log, a snapshot is never held in memory as a whole
+
+
+class OutOfStock(Exception):
+    def __init__(self, ids : list[int]):
+        super().__init__(f"Not enough stock for books {ids}")
+        self.ids = ids
+
+
+class BookExists(Exception):
+    pass
+
+
+class BookBackend(Protocol):
+    """What the router needs from a storage backend, see DataBase and SQLiteDataBase."""
+    epoch : str # ETag prefix, changes when the versions may start again
+    @property
+    def version(self)-> int: ...
+    def get(self, id : int)-> Optional[Book]: ...
+    def version_of(self, id : int)-> Optional[int]: ...
+    def get_by_title(self, title : str)-> Optional[Book]: ...
+    def get_by_author(self, author : str)-> list[Book]: ...
+    def get_by_category(self, category : Categories)-> list[Book]: ...
+    def search(self, query : str, limit : int = 10, prefix : bool = True)-> list[Book]: ...
+    def get_by_price(self, category : Categories, low : float, high : float, offset : int = 0, limit : int = 50)-> list[Book]: ...
+    def summary(self)-> dict[Categories,CategoryStats]: ...
+    def page(self, after : int = 0, limit : int = 50)-> list[Book]: ...
+    def add(self, new_book : BookCreate)-> Book: ...
+    def add_many(self, new_books : list[BookCreate])-> list[Book | BookExists]: ...
+    def update(self, id : int, fields : dict)-> Book: ...
+    def remove(self, id : int)-> Book: ...
+    def reserve(self, quantities : dict[int,int])-> list[Book]: ...
+    def release(self, quantities : dict[int,int])-> list[Book]: ...
 
 
 class DataBase(BaseModel):
-    Books : dict[int,list[Book]] = Field(default_factory=dict)
+    """In process backend, every worker has its own copy."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # Column storage, Book models are only built for the rows a request returns
+    Books : BookStore = Field(default_factory=BookStore)
+    # Secondary indexes, kept in sync by add/update/remove so lookups don't scan Books
+    by_title : dict[str,int] = Field(default_factory=dict) # lowercased title -> id (titles are unique)
+    by_author : dict[str,set[int]] = Field(default_factory=dict) # lowercased author -> ids
+    by_category : dict[Categories,set[int]] = Field(default_factory=dict)
+    text_index : SearchIndex = Field(default_factory=SearchIndex) # words of titles and authors
+    stats : InventoryStats = Field(default_factory=InventoryStats) # price ranges and totals per category
+    last_id : int = 0 # len(Books) + 1 collides after a delete
+    version : int = 0 # bumped on every write, a page of books is unchanged while it stays the same
+    epoch : str = Field(default_factory=lambda: uuid.uuid4().hex[:8]) # versions start again at 1 after a restart
+    _log : Optional[BookLog] = PrivateAttr(default=None) # set by open_log, None = in memory only
+    # Writers hold it, so a check-then-write (stock reservation) can't interleave with another write
+    _lock : threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _snapshotting : threading.Lock = PrivateAttr(default_factory=threading.Lock) # one snapshot at a time
+
+    def _index(self, book : Book, text : bool = True)-> None:
+        self.by_title[book.title.lower()] = book.id
+        self.by_author.setdefault(book.author.lower(), set()).add(book.id)
+        self.by_category.setdefault(book.category, set()).add(book.id)
+        if text:
+            self.text_index.add(book.id, book.title, book.author)
+
+    def _unindex(self, book : Book)-> None:
+        self.by_title.pop(book.title.lower(), None)
+        self.text_index.remove(book.id, book.title, book.author)
+        for index, key in ((self.by_author, book.author.lower()), (self.by_category, book.category)):
+            ids = index.get(key)
+            if ids is None:
+                continue
+            ids.discard(book.id)
+            if not ids:
+                del index[key]
+
+    def get(self, id : int)-> Optional[Book]:
+        return self.Books.get(id)
+
+    def version_of(self, id : int)-> Optional[int]:
+        return self.Books.version_of(id)
+
+    def get_by_title(self, title : str)-> Optional[Book]:
+        id = self.by_title.get(title.lower())
+        return None if id is None else self.Books.get(id)
+
+    def get_by_author(self, author : str)-> list[Book]:
+        return [self.Books.get(id) for id in sorted(self.by_author.get(author.lower(), ()))]
+
+    def get_by_category(self, category : Categories)-> list[Book]:
+        return [self.Books.get(id) for id in sorted(self.by_category.get(category, ()))]
+
+    def search(self, query : str, limit : int = 10, prefix : bool = True)-> list[Book]:
+        return [self.Books.get(id) for id in self.text_index.search(query, limit, prefix, book=self.Books.get)]
+
+    def get_by_price(self, category : Categories, low : float, high : float, offset : int = 0, limit : int = 50)-> list[Book]:
+        return [self.Books.get(id) for id in self.stats.between(category, low, high, offset, limit)]
+
+    def summary(self)-> dict[Categories,CategoryStats]:
+        return self.stats.summary()
+
+    def page(self, after : int = 0, limit : int = 50)-> list[Book]:
+        # Keyset pagination: first `limit` books with id > after
+        return self.Books.page(after, limit)
+
+    def _put(self, book : Book)-> None:
+        self.Books.append(book) # ids only grow, so the rows stay sorted
+        self.version += 1
+        self.last_id = max(self.last_id, book.id)
+        self._index(book)
+        self.stats.add(book)
+
+    def _put_many(self, books : list[Book])-> None:
+        # _put for a batch (snapshot, log replay, import): the new words are merged into the
+        # search vocabulary and the prices into the price indexes once, not one insert each
+        for book in books:
+            self.Books.append(book)
+            self._index(book, text=False)
+        if books: # set once, a pydantic field assignment is not free
+            self.version += len(books)
+            self.last_id = max(self.last_id, books[-1].id)
+        self.text_index.add_many((book.id, book.title, book.author) for book in books)
+        self.stats.add_many(books)
+
+    def _set(self, id : int, fields : dict)-> Book:
+        old = self.Books.get(id)
+        if old is None:
+            raise KeyError(id)
+        book = self.Books.update(id, fields)
+        self.version += 1
+        # price/stock changes (reservations) don't touch the indexed fields
+        if fields.keys() & {"title", "author", "category"}:
+            self._unindex(old)
+            self._index(book)
+        if fields.keys() & {"price", "stock_count", "category"}:
+            self.stats.update(old, book)
+        return book
+
+    def _pop(self, id : int)-> Book:
+        book = self.Books.delete(id) # KeyError if missing
+        self.version += 1
+        self._unindex(book)
+        self.stats.remove(book)
+        return book
+
+    def _logged(self, op : str, **data)-> None:
+        if self._log is None:
+            return
+        self._log.append(op, **data)
+        # Under _lock: only the copy of the columns holds the writers, the snapshot itself is
+        # written on a thread. Skipped while one is running, the next write tries again.
+        if self._log.needs_snapshot() and self._snapshotting.acquire(blocking=False):
+            write = self._start_snapshot()
+            threading.Thread(target=self._snapshot_in_background, args=(write,), daemon=True).start()
+
+    def _start_snapshot(self)-> Callable[[], None]:
+        log, last_id, books = self._log, self.last_id, self.Books.copy()
+        seq = log.rotate()
+        return lambda: log.snapshot(seq, last_id, iter(books))
+
+    def _snapshot_in_background(self, write : Callable[[], None])-> None:
+        try:
+            write()
+        finally:
+            self._snapshotting.release()
+
+    def snapshot(self)-> None:
+        """Write a snapshot now and wait for it."""
+        with self._snapshotting:
+            with self._lock:
+                write = self._start_snapshot()
+            write()
+
+    def add(self, new_book : BookCreate)-> Book:
+        with self._lock:
+            if new_book.title.lower() in self.by_title:
+                raise BookExists(new_book.title)
+            book = Book(id=self.last_id + 1, **new_book.model_dump())
+            self._put(book)
+            self._logged("add", book=book.model_dump(mode="json"))
+            return book
+
+    def add_many(self, new_books : list[BookCreate])-> list[Book | BookExists]:
+        """Bulk import: one lock for the whole batch, an error in place of each rejected book."""
+        results : list[Book | BookExists] = []
+        books : list[Book] = []
+        with self._lock:
+            titles = set() # of this batch, not in by_title before _put_many
+            for new_book in new_books:
+                title = new_book.title.lower()
+                if title in self.by_title or title in titles:
+                    results.append(BookExists(new_book.title))
+                    continue
+                titles.add(title)
+                book = Book(id=self.last_id + len(books) + 1, **new_book.model_dump())
+                books.append(book)
+                results.append(book)
+            self._put_many(books)
+            for book in books:
+                self._logged("add", book=book.model_dump(mode="json"))
+        return results
+
+    def update(self, id : int, fields : dict)-> Book:
+        with self._lock:
+            # Renaming onto another book's title would break the title index
+            if "title" in fields and self.by_title.get(fields["title"].lower(), id) != id:
+                raise BookExists(fields["title"])
+            book = self._set(id, fields)
+            self._logged("update", id=id, fields=fields)
+            return book
+
+    def remove(self, id : int)-> Book:
+        with self._lock:
+            book = self._pop(id)
+            self._logged("delete", id=id)
+            return book
+
+    def reserve(self, quantities : dict[int,int])-> list[Book]:
+        """Take stock for every book or for none of them, stock never goes below zero."""
+        return self._move_stock(quantities, -1)
+
+    def release(self, quantities : dict[int,int])-> list[Book]:
+        """Give back stock taken by reserve."""
+        return self._move_stock(quantities, 1)
+
+    def _move_stock(self, quantities : dict[int,int], sign : int)-> list[Book]:
+        with self._lock:
+            stocks = {id: self.Books.stock(id) for id in quantities}
+            missing = [id for id, stock in stocks.items() if stock is None]
+            if missing:
+                raise KeyError(missing)
+            short = [id for id, quantity in quantities.items() if stocks[id][0] + sign * quantity < 0]
+            if short:
+                raise OutOfStock(short)
+            # Only absolute values go to the log, so replaying it twice gives the same stock
+            books = []
+            for id, quantity in quantities.items():
+                fields = {"stock_count": stocks[id][0] + sign * quantity}
+                books.append(self._set(id, fields))
+                self._logged("update", id=id, fields=fields)
+            return books
+
+    def open_log(self, log : BookLog)-> None:
+        # Load the latest snapshot, replay the log tail on top of it, then log every change
+        last_id, books, records = log.load()
+        while batch := list(islice(books, LOAD_BATCH)):
+            self._put_many(batch)
+        added : list[Book] = [] # consecutive adds of the log, put as one batch
+        for record in records:
+            if record["op"] == "add":
+                added.append(Book(**record["book"]))
+                if len(added) < LOAD_BATCH:
+                    continue
+            self._put_many(added)
+            added = []
+            if record["op"] == "update":
+                self._set(record["id"], record["fields"])
+            elif record["op"] == "delete":
+                self._pop(record["id"])
+        self._put_many(added)
+        self.last_id = max(self.last_id, last_id)
+        self._log = log
+
+    def close_log(self)-> None:
+        with self._snapshotting: # let a background snapshot finish
+            pass
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+def open_db()-> BookBackend:
+    # BOOKS_BACKEND=sqlite is shared by all the uvicorn workers, memory (default) is per process
+    backend = os.environ.get("BOOKS_BACKEND", "memory")
+    if backend == "sqlite":
+        from sqlite_db import SQLiteDataBase
+        return SQLiteDataBase(os.environ.get("BOOKS_SQLITE_PATH", "books.db"))
+    if backend != "memory":
+        raise ValueError(f"Unknown BOOKS_BACKEND {backend!r}, use memory or sqlite")
+    db = DataBase()
+    # Persistence is optional: BOOKS_DATA_DIR=./data python3 main.py
+    if os.environ.get("BOOKS_DATA_DIR"):
+        db.open_log(BookLog(
+            os.environ["BOOKS_DATA_DIR"],
+            snapshot_every=int(os.environ.get("BOOKS_SNAPSHOT_EVERY", 100_000)),
+        ))
+    return db
 
-db = DataBase()
+db = open_db()
 
 
 
@@ -0,0 +1,56 @@
+# Change feed for the Server-Sent Events endpoint: the last changes in a ring buffer,
+# numbered by a sequence that only grows, so a client can resume where it stopped.
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Optional
+
+
+class ChangeFeed:
+    def __init__(self, maxlen : int = 10_000):
+        self.events : deque[tuple[int, str, str]] = deque(maxlen=maxlen) # (seq, type, encoded data)
+        self.seq = 0
+        self._waiters : set[asyncio.Future] = set()
+
+    def publish(self, type : str, data : dict)-> None:
+        self.seq += 1
+        self.events.append((self.seq, type, json.dumps({"seq": self.seq, "type": type, **data})))
+        waiters, self._waiters = self._waiters, set()
+        for waiter in waiters:
+            # the write may come from a threadpool route, wake the waiter on its own loop
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+    def since(self, seq : int)-> Optional[list[tuple[int, str, str]]]:
+        """Events after seq, None when some of them already left the buffer, or when seq was
+        never reached here (given by another worker, or before a restart): reload either way."""
+        if seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        if not self.events or self.events[0][0] > seq + 1:
+            return None
+        # seqs in the buffer are contiguous, the first one after seq is at a known position
+        start = seq + 1 - self.events[0][0]
+        return [self.events[i] for i in range(start, len(self.events))]
+
+    async def wait(self, seq : int, timeout : float)-> None:
+        """Return when there is an event after seq, or after timeout."""
+        if seq < self.seq:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+
+
+def _wake(waiter : asyncio.Future)-> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+feed = ChangeFeed(maxlen=int(os.environ.get("BOOKS_FEED_SIZE", 10_000)))
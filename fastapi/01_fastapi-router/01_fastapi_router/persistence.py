@@ -0,0 +1,112 @@
+# Optional persistence for the DataBase: an append-only log of add/update/delete
+# plus a periodic snapshot, so a restart only replays the log written since the last snapshot.
+# The snapshot is written from a copy of the columns, on a thread, while a new log takes the writes.
+import json
+import os
+import shutil
+from typing import Iterator
+from schemas.Book import Book
+
+
+class BookLog:
+    SNAPSHOT_NAME = "books.snapshot.jsonl"
+    LOG_NAME = "books.log.jsonl"
+
+    def __init__(self, directory : str, snapshot_every : int = 100_000, fsync : bool = False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every # log records between two snapshots
+        self.fsync = fsync # flush to the disk on every write (slow), otherwise only to the OS
+        self.snapshot_path = os.path.join(directory, BookLog.SNAPSHOT_NAME)
+        self.log_path = os.path.join(directory, BookLog.LOG_NAME)
+        self.old_path = self.log_path + ".old" # the log being folded into a snapshot
+        self.seq = 0 # sequence number of the last record written
+        self.tail = 0 # records in the log since the last snapshot
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self)-> tuple[int, Iterator[Book], list[dict]]:
+        """Return (last_id, snapshot books, log records newer than the snapshot)."""
+        last_id, snapshot_seq = 0, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as file:
+                header = json.loads(file.readline())
+                last_id, snapshot_seq = header["last_id"], header["seq"]
+        # A log rotated for a snapshot that never made it (crash) comes before the current one
+        records = self._read(self.old_path, snapshot_seq)
+        records += self._read(self.log_path, records[-1]["seq"] if records else snapshot_seq)
+        self.seq = records[-1]["seq"] if records else snapshot_seq
+        self.tail = len(records)
+        self._file = open(self.log_path, "ab")
+        return last_id, self._snapshot_books(), records
+
+    @staticmethod
+    def _read(path : str, after : int)-> list[dict]:
+        records = []
+        good_size = 0
+        if not os.path.exists(path):
+            return records
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break # torn write from a crash, everything after it is garbage
+                good_size += len(line)
+                # Records the snapshot already covers (crash between the snapshot rename and the
+                # removal of the old log), or copied twice by a rotate cut short
+                if record["seq"] > after:
+                    records.append(record)
+                    after = record["seq"]
+        os.truncate(path, good_size)
+        return records
+
+    def _snapshot_books(self)-> Iterator[Book]:
+        # Streamed, the snapshot is never held in memory as a whole
+        if not os.path.exists(self.snapshot_path):
+            return
+        with open(self.snapshot_path, "rb") as file:
+            file.readline() # header
+            for line in file:
+                yield Book.model_validate_json(line)
+
+    def append(self, op : str, **data)-> None:
+        self.seq += 1
+        self.tail += 1
+        self._file.write(json.dumps({"seq": self.seq, "op": op, **data}).encode() + b"\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def needs_snapshot(self)-> bool:
+        return self.tail >= self.snapshot_every
+
+    def rotate(self)-> int:
+        """Start a new log for the writes made while a snapshot is written, the old one is kept
+        until the snapshot is in place. Returns the sequence number the snapshot covers."""
+        self._file.close()
+        if os.path.exists(self.old_path): # left by a snapshot that failed, still needed
+            with open(self.log_path, "rb") as log, open(self.old_path, "ab") as old:
+                shutil.copyfileobj(log, old)
+        else:
+            os.replace(self.log_path, self.old_path)
+        self._file = open(self.log_path, "wb")
+        self.tail = 0
+        return self.seq
+
+    def snapshot(self, seq : int, last_id : int, books : Iterator[Book])-> None:
+        """Write the state as of seq (see rotate). Doesn't touch the current log, so it can run
+        on another thread while the writes go on."""
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(json.dumps({"seq": seq, "last_id": last_id}).encode() + b"\n")
+            for book in books:
+                file.write(book.model_dump_json().encode() + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path) # readers never see a half written snapshot
+        os.remove(self.old_path) # the snapshot covers it
+
+    def close(self)-> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,52 +1,274 @@
-from fastapi import APIRouter, HTTPException,Path,Query
-from schemas.Book import Book,BookCreate,BookUpdate
-from db import db
+from fastapi import APIRouter, HTTPException,Path,Query,Header,Response,Request
+from fastapi.responses import StreamingResponse
+from schemas.Book import Book,BookCreate,BookUpdate,StockRequest,Categories,CategoryStats
+from db import db,OutOfStock,BookExists
+from cache import ResponseCache
+from feed import feed
+from typing import Any,AsyncIterator,Optional
+from pydantic import ValidationError
+import json
 
 router = APIRouter(
     prefix="/Books",
 )
 
-#show all the Books
+# Encoded responses, reused while the book (or for pages, the whole DataBase) keeps its version
+book_cache = ResponseCache(maxsize=10_000)
+page_cache = ResponseCache(maxsize=1_000)
+
+def _cached_response(etag : str, if_none_match : Optional[str], body)-> Response:
+    """304 when the client already has this version, else the encoded body (body() builds it)."""
+    headers = {"ETag" : etag}
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=body(), media_type="application/json", headers=headers)
+
+#show the Books, one page at a time
 @router.get("/")
-async def get_all()->dict[str,dict]:
-    return {"Books" : db.Books}
+async def get_all(
+    cursor : int = Query(0, ge=0, description="next_cursor of the previous page, 0 for the first page"),
+    limit : int = Query(50, ge=1, le=500, description="Max number of books in the page"),
+    fields : Optional[str] = Query(None, description="Comma separated fields to return, e.g. title,price"),
+    if_none_match : Optional[str] = Header(None),
+    )->dict[str,Any]:
+    include = None
+    if fields:
+        include = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = include - Book.model_fields.keys()
+        if unknown:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+            )
+
+    key = (cursor, limit, frozenset(include) if include else None)
+    version = db.version
+
+    def body()-> bytes:
+        cached = page_cache.get(key, version)
+        if cached is not None:
+            return cached
+        books = db.page(after=cursor, limit=limit)
+        # Keyset on the id: the token stays valid when books are added or deleted
+        next_cursor = books[-1].id if len(books) == limit else None
+        encoded = json.dumps({
+            "Books" : {book.id : book.model_dump(mode="json", include=include) for book in books},
+            "next_cursor" : next_cursor,
+        }).encode()
+        page_cache.put(key, version, encoded)
+        return encoded
+
+    return _cached_response(f'"{db.epoch}-{version}"', if_none_match, body)
 
 
 @router.post("/",status_code=201)
 async def add_book(new_book : BookCreate)->dict[str,Book]:
-    # Check if a book with the same name already exists
-    for book in db.Books.values():
-        if book.title.lower() == new_book.title.lower():
-            raise HTTPException(
+    #Create instance of Books BaseModel, the DataBase generates the ID
+    try:
+        book = db.add(new_book)
+    except BookExists: # same title (index lookup, no scan)
+        raise HTTPException(
                 status_code=400,
                 detail="Book already exists.",
             )
-    #Generate ID
-    new_id = len(db.Books) + 1
-
-    #Create instance of Books BaseModel
-    book = Book(id=new_id, **new_book.model_dump())
-    db.Books[new_id] = book
+    feed.publish("add", {"id" : book.id, "book" : book.model_dump(mode="json")})
     return {"added" : book}
 
+@router.get('/title/{title}')
+async def get_book_by_title(title : str)-> Book:
+    book = db.get_by_title(title)
+    if book is None:
+        raise HTTPException(
+                status_code=404,
+                detail="Book don't exists.",
+            )
+    return book
+
+@router.get('/author/{author}')
+async def get_books_by_author(author : str)-> list[Book]:
+    return db.get_by_author(author)
+
+#Books of a category in a price range, cheapest first
+@router.get('/category/{category}')
+async def get_books_by_price(
+    category : Categories,
+    min_price : float = Query(0, ge=0),
+    max_price : float = Query(float("inf"), ge=0),
+    offset : int = Query(0, ge=0),
+    limit : int = Query(50, ge=1, le=500),
+    )-> list[Book]:
+    return db.get_by_price(category, min_price, max_price, offset, limit)
+
+#Count, stock and stock * price per category, kept up to date on every write
+@router.get('/stats')
+async def get_stats()-> dict[Categories,CategoryStats]:
+    return db.summary()
+
+#Atomic stock changes for checkouts, all the items succeed or none of them
+@router.post('/reserve')
+async def reserve(request : StockRequest)-> dict[str,list[Book]]:
+    books = _move_stock(request, db.reserve)
+    _publish_stock(books)
+    return {"reserved" : books}
+
+@router.post('/release')
+async def release(request : StockRequest)-> dict[str,list[Book]]:
+    books = _move_stock(request, db.release)
+    _publish_stock(books)
+    return {"released" : books}
+
+def _publish_stock(books : list[Book])-> None:
+    for book in books:
+        feed.publish("stock", {"id" : book.id, "stock_count" : book.stock_count})
+
+def _move_stock(request : StockRequest, move)-> list[Book]:
+    quantities : dict[int,int] = {}
+    for item in request.items:
+        quantities[item.id] = quantities.get(item.id, 0) + item.quantity
+    try:
+        return move(quantities)
+    except KeyError as error:
+        raise HTTPException(
+                status_code=400,
+                detail=f"Book don't exists: {error.args[0]}",
+            )
+    except OutOfStock as error:
+        raise HTTPException(
+                status_code=409,
+                detail=f"Not enough stock for books: {error.ids}",
+            )
+
+#Ranked full-text search, the last word may be a prefix for autocomplete
+@router.get('/search')
+async def search(
+    q : str = Query(..., min_length=1, description="Words of the title or the author"),
+    limit : int = Query(10, ge=1, le=100),
+    prefix : bool = Query(True, description="Match the last word as a prefix"),
+    )-> list[Book]:
+    return db.search(q, limit=limit, prefix=prefix)
+
+#Bulk import, one JSON book per line (BookCreate), streamed and added batch by batch
+@router.post('/import')
+async def import_books(
+    request : Request,
+    batch_size : int = Query(1000, ge=1, le=10_000),
+    )-> dict[str,Any]:
+    imported = 0
+    errors = []
+    batch : list[tuple[int,BookCreate]] = []
+
+    def flush()-> None:
+        nonlocal imported
+        results = db.add_many([new_book for _, new_book in batch])
+        for (line_number, _), result in zip(batch, results):
+            if isinstance(result, BookExists):
+                errors.append({"line" : line_number, "error" : "Book already exists."})
+                continue
+            imported += 1
+            feed.publish("add", {"id" : result.id, "book" : result.model_dump(mode="json")})
+        batch.clear()
+
+    async for line_number, line in _lines(request.stream()):
+        try:
+            batch.append((line_number, BookCreate.model_validate_json(line)))
+        except ValidationError as error:
+            errors.append({"line" : line_number, "error" : "; ".join(
+                ": ".join(filter(None, (".".join(map(str, detail["loc"])), detail["msg"])))
+                for detail in error.errors()
+            )})
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return {"imported" : imported, "errors" : sorted(errors, key=lambda error: error["line"])}
+
+async def _lines(chunks : AsyncIterator[bytes])-> AsyncIterator[tuple[int,bytes]]:
+    """(line number, line) of a streamed body, without holding the whole body in memory."""
+    rest = b""
+    line_number = 0
+    async for chunk in chunks:
+        *lines, rest = (rest + chunk).split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if rest.strip():
+        yield line_number + 1, rest
+
+#Bulk export, one JSON book per line, read from the store one page at a time
+@router.get('/export')
+async def export_books(page_size : int = Query(1000, ge=1, le=10_000)):
+    async def stream():
+        after = 0
+        while True:
+            books = db.page(after=after, limit=page_size)
+            if not books:
+                return
+            yield b"".join(book.model_dump_json().encode() + b"\n" for book in books)
+            after = books[-1].id
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+#Server-Sent Events: add/update/delete/stock changes, from the sequence id the client has seen
+@router.get('/changes')
+async def changes(
+    since : Optional[int] = Query(None, ge=0, description="Last seq received, default: only new changes"),
+    last_event_id : Optional[int] = Header(None, ge=0), # sent by EventSource when it reconnects
+    ):
+    seq = last_event_id if last_event_id is not None else since
+    if seq is None:
+        seq = feed.seq
+
+    async def stream():
+        nonlocal seq
+        while True:
+            events = feed.since(seq)
+            if events is None:
+                # Too far behind for the ring buffer: the client has to reload, then follow from here
+                seq = feed.seq
+                yield f"id: {seq}\nevent: reset\ndata: {{\"seq\": {seq}}}\n\n"
+                continue
+            for event_seq, type, data in events:
+                yield f"id: {event_seq}\nevent: {type}\ndata: {data}\n\n"
+                seq = event_seq
+            if not events:
+                await feed.wait(seq, timeout=15)
+                if feed.seq == seq:
+                    yield ": keep-alive\n\n" # comment line, keeps proxies from closing the connection
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control" : "no-cache"})
+
 @router.get('/{id_book}')
-async def get_book_by_id(id_book : int)-> Book:
-    if id_book not in db.Books:
+async def get_book_by_id(id_book : int, if_none_match : Optional[str] = Header(None))-> Book:
+    version = db.version_of(id_book) # no model built for a 304 or a cache hit
+    if version is None:
         raise HTTPException(
                 status_code=400,
                 detail="Book don't exists.",
             )
-    return db.Books[id_book]
+
+    def body()-> bytes:
+        cached = book_cache.get(id_book, version)
+        if cached is None:
+            cached = db.get(id_book).model_dump_json().encode()
+            book_cache.put(id_book, version, cached)
+        return cached
+
+    return _cached_response(f'"{db.epoch}-{id_book}-{version}"', if_none_match, body)
 
 @router.delete("/{id}", status_code = 204)
 async def delete(id: int)-> None: # None Because there is a Error when return Dict  
     try:
-        db.Books.pop(id)
+        db.remove(id)
+        book_cache.invalidate(id)
     except KeyError:
         raise HTTPException(
                 status_code=400,
                 detail="Book don't exists.",
             )
+    feed.publish("delete", {"id" : id})
 
 #Update specific field/s
 @router.patch('/{id_book}')
@@ -55,7 +277,7 @@ async def Update(
     book_data: BookUpdate = Query(...) # Tried Body but Query is better
     )-> dict[str,dict]:
     
-    if id_book not in db.Books:
+    if db.get(id_book) is None:
         raise HTTPException(
                 status_code=400,
                 detail="Book don't exists.",
@@ -68,10 +290,13 @@ async def Update(
             detail="No fields to update.",
         )
     
-    book = db.Books[id_book]
-    for field, value in book_data.model_dump(exclude_unset=True).items():
-        setattr(book,field,value) #(list_name,key,value)
-
-    db.Books[id_book] = book
+    try:
+        book = db.update(id_book, update_data) # keeps the secondary indexes in sync
+    except BookExists: # renamed onto another book's title
+        raise HTTPException(
+                status_code=400,
+                detail="Book already exists.",
+            )
+    feed.publish("update", {"id" : book.id, "book" : book.model_dump(mode="json")})
     return {"Book Updated" : book.model_dump()}
 
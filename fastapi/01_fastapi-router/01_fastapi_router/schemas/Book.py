@@ -25,6 +25,19 @@ class BookUpdate(BaseModel):
     author : Optional[str] = None
     price: Optional[float] = Field(None, ge=0)
     stock_count: Optional[int] = Field(None, ge=0)
+
+class CategoryStats(BaseModel):
+    count: int = Field(0, description="Number of books")
+    total_stock: int = Field(0, description="Sum of stock_count")
+    inventory_value: float = Field(0.0, description="Sum of stock_count * price")
+
+class StockItem(BaseModel):
+    id: int = Field(..., description="Book id")
+    quantity: int = Field(..., gt=0, description="Number of copies to reserve or release")
+
+class StockRequest(BaseModel):
+    items: list[StockItem] = Field(..., min_length=1, description="One item per book, or several for a whole cart")
+
 """
 b = BookUpdate(name = 'Jhon', price = 12)
 for val in b.model_dump().values():
@@ -0,0 +1,193 @@
+# Full-text and prefix search over the book titles and authors.
+# Inverted index: token -> book ids, one per field. Prefix lookups use the sorted vocabulary,
+# a flat trie: every token starting with a prefix sits in one contiguous run found by bisection.
+import heapq
+import re
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text : str)-> list[str]:
+    return TOKEN.findall(text.lower())
+
+
+class Vocabulary:
+    """Sorted tokens, in blocks of at most 2 * BLOCK (as stats.PriceIndex): a new token shifts
+    one block, not every token after it."""
+    BLOCK = 1000
+
+    def __init__(self):
+        self.blocks : list[list[str]] = []
+        self.lasts : list[str] = [] # last token of each block
+
+    def __len__(self)-> int:
+        return sum(len(block) for block in self.blocks)
+
+    def __iter__(self)-> Iterator[str]:
+        for block in self.blocks:
+            yield from block
+
+    def add(self, token : str)-> None:
+        if not self.blocks:
+            self.blocks.append([token])
+            self.lasts.append(token)
+            return
+        position = min(bisect_left(self.lasts, token), len(self.blocks) - 1)
+        block = self.blocks[position]
+        insort(block, token)
+        self.lasts[position] = block[-1]
+        if len(block) > 2 * Vocabulary.BLOCK:
+            half = len(block) // 2
+            self.blocks[position:position + 1] = [block[:half], block[half:]]
+            self.lasts.insert(position, block[half - 1])
+
+    def add_many(self, tokens : set[str])-> None:
+        # many new tokens next to the vocabulary: sorted once with it instead of inserted one by one
+        if len(tokens) < len(self) // 8:
+            for token in tokens:
+                self.add(token)
+            return
+        merged = sorted([*self, *tokens])
+        self.blocks = [merged[start:start + Vocabulary.BLOCK] for start in range(0, len(merged), Vocabulary.BLOCK)]
+        self.lasts = [block[-1] for block in self.blocks]
+
+    def remove(self, token : str)-> None:
+        position = bisect_left(self.lasts, token)
+        block = self.blocks[position]
+        del block[bisect_left(block, token)]
+        if not block:
+            del self.blocks[position]
+            del self.lasts[position]
+        else:
+            self.lasts[position] = block[-1]
+
+    def starting_at(self, first : str)-> Iterator[str]:
+        """The tokens from first on, in order."""
+        position = bisect_left(self.lasts, first)
+        if position < len(self.blocks):
+            yield from islice(self.blocks[position], bisect_left(self.blocks[position], first), None)
+        for block in self.blocks[position + 1:]:
+            yield from block
+
+
+class SearchIndex:
+    FIELDS = {"title": 2, "author": 1} # field -> weight in the ranking
+    MAX_EXPANSIONS = 64 # tokens a lone prefix may expand to, keeps autocomplete bounded on short prefixes
+
+    def __init__(self):
+        self.postings : dict[str, dict[str, set[int]]] = {field: {} for field in SearchIndex.FIELDS}
+        self.vocabulary = Vocabulary() # every token of every field once
+
+    def add(self, id : int, title : str, author : str)-> None:
+        for field, text in (("title", title), ("author", author)):
+            for token in set(tokenize(text)):
+                ids = self.postings[field].get(token)
+                if ids is None:
+                    ids = self.postings[field][token] = set()
+                    if not self._known(token, skip=field):
+                        self.vocabulary.add(token)
+                ids.add(id)
+
+    def add_many(self, books : Iterable[tuple[int, str, str]])-> None:
+        """add() for (id, title, author) of many books: the new tokens go to the vocabulary
+        together, sorted once when they are many."""
+        new = set()
+        for id, title, author in books:
+            for field, text in (("title", title), ("author", author)):
+                postings = self.postings[field]
+                for token in set(tokenize(text)):
+                    ids = postings.get(token)
+                    if ids is None:
+                        ids = postings[token] = set()
+                        if not self._known(token, skip=field):
+                            new.add(token)
+                    ids.add(id)
+        self.vocabulary.add_many(new)
+
+    def remove(self, id : int, title : str, author : str)-> None:
+        for field, text in (("title", title), ("author", author)):
+            for token in set(tokenize(text)):
+                ids = self.postings[field].get(token)
+                if ids is None:
+                    continue
+                ids.discard(id)
+                if not ids:
+                    del self.postings[field][token]
+                    if not self._known(token):
+                        self.vocabulary.remove(token)
+
+    def _known(self, token : str, skip : str = "")-> bool:
+        return any(token in postings for field, postings in self.postings.items() if field != skip)
+
+    def _completions(self, prefix : str)-> Iterator[str]:
+        # every token starting with prefix, in order
+        for token in self.vocabulary.starting_at(prefix):
+            if not token.startswith(prefix):
+                return
+            yield token
+
+    def _postings(self, tokens : list[str])-> list[tuple[int, set[int]]]:
+        return [(weight, ids) for field, weight in SearchIndex.FIELDS.items()
+                for token in tokens if (ids := self.postings[field].get(token))]
+
+    def search(self, query : str, limit : int = 10, prefix : bool = True,
+               book : Optional[Callable[[int], Any]] = None)-> list[int]:
+        """Ids of the books matching every term, best first. With prefix the last term
+        may be the start of a word (autocomplete). book(id): the book (its title and author),
+        to test a prefix on a few candidates rather than on its many completions."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        if not prefix:
+            scores = self._match([self._postings([term]) for term in terms])
+        elif len(terms) > 1:
+            # The other terms find the candidates, then every completion of the prefix is
+            # tested against them only: none is dropped, however common the prefix
+            scores = self._match_prefix(self._match([self._postings([term]) for term in terms[:-1]]), terms[-1], book)
+        else: # a lone prefix: the books of its first MAX_EXPANSIONS completions (a list, read once per field)
+            scores = self._match([self._postings(list(islice(self._completions(terms[0]), SearchIndex.MAX_EXPANSIONS)))])
+        return heapq.nsmallest(limit, scores, key=lambda id: (-scores[id], id))
+
+    def _match(self, per_term : list[list[tuple[int, set[int]]]])-> dict[int, int]:
+        """Score of the books matching every term (the postings of each), best field weight per term."""
+        # AND: only the rarest term is walked, the others are membership tests
+        per_term.sort(key=lambda postings: sum(len(ids) for _, ids in postings))
+        scores : dict[int, int] = {}
+        for weight, ids in per_term[0]:
+            for id in ids:
+                if scores.get(id, 0) < weight:
+                    scores[id] = weight
+        for postings in per_term[1:]:
+            for id in list(scores):
+                weight = max((weight for weight, ids in postings if id in ids), default=0)
+                if weight:
+                    scores[id] += weight
+                else:
+                    del scores[id]
+        return scores
+
+    def _match_prefix(self, scores : dict[int, int], prefix : str, book : Optional[Callable[[int], Any]])-> dict[int, int]:
+        # scores of the candidates holding a token that starts with prefix, its weight added
+        weights : dict[int, int] = {}
+        if not scores:
+            return weights
+        if book is not None and len(scores) <= sum(1 for _ in islice(self._completions(prefix), len(scores))):
+            # fewer candidates than completions (short prefix): look for a word starting with
+            # prefix in the text of each candidate
+            starts_word = re.compile(r"(?<!\w)" + re.escape(prefix))
+            for id in scores:
+                found = book(id)
+                weights[id] = max((weight for field, weight in SearchIndex.FIELDS.items()
+                                   if starts_word.search(getattr(found, field).lower())), default=0)
+            return {id: scores[id] + weight for id, weight in weights.items() if weight}
+        for token in self._completions(prefix):
+            for field, weight in SearchIndex.FIELDS.items():
+                ids = self.postings[field].get(token)
+                if ids:
+                    for id in scores.keys() & ids: # walks the smaller of the two
+                        if weights.get(id, 0) < weight:
+                            weights[id] = weight
+        return {id: scores[id] + weight for id, weight in weights.items()}
@@ -0,0 +1,260 @@
+# SQLite backend, one database file shared by every uvicorn worker (WAL: readers don't block the writer).
+# Same methods as the in memory DataBase, the indexes it keeps by hand are SQLite indexes,
+# triggers and an FTS5 table here.
+import sqlite3
+import threading
+import uuid
+from typing import Optional
+from schemas.Book import Book, BookCreate, Categories, CategoryStats
+from search import tokenize
+from db import BookExists, OutOfStock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, -- ids are never reused, even after a delete
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    price REAL NOT NULL,
+    stock_count INTEGER NOT NULL CHECK (stock_count >= 0),
+    category TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    title_key TEXT NOT NULL, -- str.lower(), SQLite's lower() only knows ASCII
+    author_key TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS books_title ON books(title_key);
+CREATE INDEX IF NOT EXISTS books_author ON books(author_key);
+CREATE INDEX IF NOT EXISTS books_category_price ON books(category, price, id);
+
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+
+CREATE TABLE IF NOT EXISTS stats (
+    category TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    total_stock INTEGER NOT NULL DEFAULT 0,
+    inventory_value REAL NOT NULL DEFAULT 0
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+    title, author, content='books', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS books_insert AFTER INSERT ON books BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    UPDATE stats SET count = count + 1, total_stock = total_stock + new.stock_count,
+        inventory_value = inventory_value + new.stock_count * new.price
+        WHERE category = new.category;
+    INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_update AFTER UPDATE ON books BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    UPDATE stats SET count = count - 1, total_stock = total_stock - old.stock_count,
+        inventory_value = inventory_value - old.stock_count * old.price
+        WHERE category = old.category;
+    UPDATE stats SET count = count + 1, total_stock = total_stock + new.stock_count,
+        inventory_value = inventory_value + new.stock_count * new.price
+        WHERE category = new.category;
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_update_text AFTER UPDATE OF title, author ON books BEGIN
+    INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_delete AFTER DELETE ON books BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    UPDATE stats SET count = count - 1, total_stock = total_stock - old.stock_count,
+        inventory_value = inventory_value - old.stock_count * old.price
+        WHERE category = old.category;
+    INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+END;
+"""
+
+COLUMNS = "id, title, author, price, stock_count, category"
+
+
+class SQLiteDataBase:
+    def __init__(self, path : str):
+        # One connection per process, the lock covers the threadpool used by sync routes
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL") # durable at the WAL checkpoint, not every commit
+            # In one write transaction, the first workers start at the same time
+            self.conn.executescript(f"BEGIN IMMEDIATE; {SCHEMA} COMMIT;")
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("INSERT OR IGNORE INTO stats(category) VALUES (?)",
+                                  [(category.value,) for category in Categories])
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+            self.conn.execute("COMMIT")
+            # The file keeps its versions across restarts, so the ETag prefix is stored with them
+            self.epoch = self.conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+
+    @staticmethod
+    def _book(row : tuple)-> Book:
+        id, title, author, price, stock_count, category = row
+        return Book.model_construct(id=id, title=title, author=author, price=price,
+                                    stock_count=stock_count, category=Categories(category))
+
+    def _books(self, sql : str, params : tuple = ())-> list[Book]:
+        with self.lock:
+            return [self._book(row) for row in self.conn.execute(sql, params)]
+
+    def _one(self, sql : str, params : tuple = ())-> Optional[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    @property
+    def version(self)-> int:
+        return self._one("SELECT value FROM meta WHERE key = 'version'")[0]
+
+    def get(self, id : int)-> Optional[Book]:
+        row = self._one(f"SELECT {COLUMNS} FROM books WHERE id = ?", (id,))
+        return None if row is None else self._book(row)
+
+    def version_of(self, id : int)-> Optional[int]:
+        row = self._one("SELECT version FROM books WHERE id = ?", (id,))
+        return None if row is None else row[0]
+
+    def get_by_title(self, title : str)-> Optional[Book]:
+        row = self._one(f"SELECT {COLUMNS} FROM books WHERE title_key = ?", (title.lower(),))
+        return None if row is None else self._book(row)
+
+    def get_by_author(self, author : str)-> list[Book]:
+        return self._books(f"SELECT {COLUMNS} FROM books WHERE author_key = ? ORDER BY id", (author.lower(),))
+
+    def get_by_category(self, category : Categories)-> list[Book]:
+        return self._books(f"SELECT {COLUMNS} FROM books WHERE category = ? ORDER BY id", (category.value,))
+
+    def search(self, query : str, limit : int = 10, prefix : bool = True)-> list[Book]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # Quoted terms (no FTS syntax from the client), implicit AND, last one as a prefix
+        match = " ".join(f'"{term}"' for term in terms) + ("*" if prefix else "")
+        return self._books(
+            f"SELECT {', '.join('books.' + column for column in COLUMNS.split(', '))} "
+            "FROM books_fts JOIN books ON books.id = books_fts.rowid "
+            "WHERE books_fts MATCH ? ORDER BY bm25(books_fts, 2.0, 1.0), books.id LIMIT ?",
+            (match, limit),
+        )
+
+    def get_by_price(self, category : Categories, low : float, high : float, offset : int = 0, limit : int = 50)-> list[Book]:
+        return self._books(
+            f"SELECT {COLUMNS} FROM books WHERE category = ? AND price BETWEEN ? AND ? "
+            "ORDER BY price, id LIMIT ? OFFSET ?",
+            (category.value, low, high, limit, offset),
+        )
+
+    def summary(self)-> dict[Categories,CategoryStats]:
+        with self.lock:
+            rows = self.conn.execute("SELECT category, count, total_stock, inventory_value FROM stats").fetchall()
+        return {
+            Categories(category): CategoryStats(count=count, total_stock=total_stock,
+                                                inventory_value=round(value, 2))
+            for category, count, total_stock, value in rows
+        }
+
+    def page(self, after : int = 0, limit : int = 50)-> list[Book]:
+        return self._books(f"SELECT {COLUMNS} FROM books WHERE id > ? ORDER BY id LIMIT ?", (after, limit))
+
+    def add(self, new_book : BookCreate)-> Book:
+        try:
+            with self.lock:
+                cursor = self.conn.execute(
+                    "INSERT INTO books (title, author, price, stock_count, category, title_key, author_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (new_book.title, new_book.author, new_book.price, new_book.stock_count,
+                     new_book.category.value, new_book.title.lower(), new_book.author.lower()),
+                )
+        except sqlite3.IntegrityError: # books_title, even when two workers race
+            raise BookExists(new_book.title)
+        return Book(id=cursor.lastrowid, **new_book.model_dump())
+
+    def add_many(self, new_books : list[BookCreate])-> list[Book | BookExists]:
+        """Bulk import: one transaction (one WAL commit) for the batch, an error in place of each rejected book."""
+        results = []
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for new_book in new_books:
+                    try:
+                        cursor = self.conn.execute(
+                            "INSERT INTO books (title, author, price, stock_count, category, title_key, author_key) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (new_book.title, new_book.author, new_book.price, new_book.stock_count,
+                             new_book.category.value, new_book.title.lower(), new_book.author.lower()),
+                        )
+                    except sqlite3.IntegrityError: # only this statement fails, the transaction goes on
+                        results.append(BookExists(new_book.title))
+                        continue
+                    results.append(Book(id=cursor.lastrowid, **new_book.model_dump()))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return results
+
+    def update(self, id : int, fields : dict)-> Book:
+        columns = dict(fields)
+        if "title" in fields:
+            columns["title_key"] = fields["title"].lower()
+        if "author" in fields:
+            columns["author_key"] = fields["author"].lower()
+        if "category" in fields:
+            columns["category"] = Categories(fields["category"]).value
+        assignments = ", ".join(f"{column} = ?" for column in columns) # names come from BookUpdate
+        try:
+            with self.lock:
+                cursor = self.conn.execute(
+                    f"UPDATE books SET {assignments}, version = version + 1 WHERE id = ?",
+                    (*columns.values(), id),
+                )
+        except sqlite3.IntegrityError:
+            raise BookExists(fields.get("title"))
+        if cursor.rowcount == 0:
+            raise KeyError(id)
+        return self.get(id)
+
+    def remove(self, id : int)-> Book:
+        with self.lock:
+            row = self.conn.execute(f"DELETE FROM books WHERE id = ? RETURNING {COLUMNS}", (id,)).fetchone()
+        if row is None:
+            raise KeyError(id)
+        return self._book(row)
+
+    def reserve(self, quantities : dict[int,int])-> list[Book]:
+        """Take stock for every book or for none of them, stock never goes below zero."""
+        return self._move_stock(quantities, -1)
+
+    def release(self, quantities : dict[int,int])-> list[Book]:
+        """Give back stock taken by reserve."""
+        return self._move_stock(quantities, 1)
+
+    def _move_stock(self, quantities : dict[int,int], sign : int)-> list[Book]:
+        with self.lock:
+            # IMMEDIATE takes the write lock up front: no other worker writes between check and update
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = list(quantities)
+                marks = ", ".join("?" * len(ids))
+                stocks = dict(self.conn.execute(f"SELECT id, stock_count FROM books WHERE id IN ({marks})", ids))
+                missing = [id for id in ids if id not in stocks]
+                if missing:
+                    raise KeyError(missing)
+                short = [id for id, quantity in quantities.items() if stocks[id] + sign * quantity < 0]
+                if short:
+                    raise OutOfStock(short)
+                self.conn.executemany(
+                    "UPDATE books SET stock_count = stock_count + ?, version = version + 1 WHERE id = ?",
+                    [(sign * quantity, id) for id, quantity in quantities.items()],
+                )
+                rows = self.conn.execute(f"SELECT {COLUMNS} FROM books WHERE id IN ({marks})", ids).fetchall()
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        books = {row[0]: self._book(row) for row in rows}
+        return [books[id] for id in ids]
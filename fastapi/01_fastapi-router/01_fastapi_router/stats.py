@@ -0,0 +1,141 @@
+# Per category price index and running totals, updated on every write instead of
+# being recomputed from all the books on every query.
+from array import array
+from bisect import bisect_left, bisect_right
+from schemas.Book import Book, Categories, CategoryStats
+
+
+class PriceIndex:
+    """Ids sorted by (price, id), in blocks of at most 2 * BLOCK entries (two parallel arrays
+    each): an insert or a delete moves one block, not every entry after it, and a range is
+    bisections. The blocks are found by bisection on the last (price, id) of each."""
+    BLOCK = 1000
+
+    def __init__(self):
+        self.blocks : list[tuple[array, array]] = [] # (prices, ids)
+        self.lasts : list[tuple[float, int]] = []
+
+    def __len__(self)-> int:
+        return sum(len(ids) for _, ids in self.blocks)
+
+    def _block(self, price : float, id : int)-> int:
+        # the first block ending at or after (price, id), the last one for keys above them all
+        return min(bisect_left(self.lasts, (price, id)), len(self.blocks) - 1)
+
+    @staticmethod
+    def _position(prices : array, ids : array, price : float, id : int)-> int:
+        low, high = bisect_left(prices, price), bisect_right(prices, price)
+        return bisect_left(ids, id, low, high) # same price: sorted by id
+
+    def add(self, price : float, id : int)-> None:
+        if not self.blocks:
+            self.blocks.append((array("d", [price]), array("q", [id])))
+            self.lasts.append((price, id))
+            return
+        block = self._block(price, id)
+        prices, ids = self.blocks[block]
+        position = self._position(prices, ids, price, id)
+        prices.insert(position, price)
+        ids.insert(position, id)
+        if position == len(ids) - 1:
+            self.lasts[block] = (price, id)
+        if len(ids) > 2 * PriceIndex.BLOCK:
+            half = len(ids) // 2
+            self.blocks[block:block + 1] = [(prices[:half], ids[:half]), (prices[half:], ids[half:])]
+            self.lasts.insert(block, (prices[half - 1], ids[half - 1]))
+
+    def add_many(self, entries : list[tuple[float, int]])-> None:
+        """Bulk load (snapshot, import): one sort instead of an insert per entry. Few entries
+        next to the index are still inserted one by one, a rebuild would cost more."""
+        if len(entries) < len(self) // 8:
+            for price, id in entries:
+                self.add(price, id)
+            return
+        merged = sorted([*((price, id) for prices, ids in self.blocks for price, id in zip(prices, ids)), *entries])
+        self.blocks = [(array("d", (price for price, _ in merged[start:start + PriceIndex.BLOCK])),
+                        array("q", (id for _, id in merged[start:start + PriceIndex.BLOCK])))
+                       for start in range(0, len(merged), PriceIndex.BLOCK)]
+        self.lasts = [(prices[-1], ids[-1]) for prices, ids in self.blocks]
+
+    def remove(self, price : float, id : int)-> None:
+        block = self._block(price, id)
+        prices, ids = self.blocks[block]
+        position = self._position(prices, ids, price, id)
+        del prices[position]
+        del ids[position]
+        if not ids:
+            del self.blocks[block]
+            del self.lasts[block]
+        elif position == len(ids):
+            self.lasts[block] = (prices[-1], ids[-1])
+
+    def between(self, low : float, high : float, offset : int = 0, limit : int = 50)-> list[int]:
+        found : list[int] = []
+        block = bisect_left(self.lasts, (low, -1)) # ids are >= 1
+        start = bisect_left(self.blocks[block][0], low) if block < len(self.blocks) else 0
+        while block < len(self.blocks) and len(found) < limit:
+            prices, ids = self.blocks[block]
+            if start + offset >= len(ids): # whole block skipped by the offset
+                offset -= len(ids) - start
+            else:
+                start += offset
+                offset = 0
+                end = min(bisect_right(prices, high, start), start + limit - len(found))
+                found.extend(ids[start:end])
+                if end < len(ids): # past high, or limit reached
+                    break
+            block += 1
+            start = 0
+        return found
+
+
+class InventoryStats:
+    def __init__(self):
+        self.prices = {category: PriceIndex() for category in Categories}
+        self.totals = {category: CategoryStats() for category in Categories}
+
+    def _count(self, book : Book, sign : int)-> None:
+        totals = self.totals[book.category]
+        totals.count += sign
+        totals.total_stock += sign * book.stock_count
+        totals.inventory_value += sign * book.stock_count * book.price
+
+    def add(self, book : Book)-> None:
+        self.prices[book.category].add(book.price, book.id)
+        self._count(book, 1)
+
+    def add_many(self, books : list[Book])-> None:
+        entries : dict[Categories, list[tuple[float, int]]] = {category: [] for category in Categories}
+        sums = {category: [0, 0.0] for category in Categories} # stock, value: set once per category
+        for book in books:
+            entries[book.category].append((book.price, book.id))
+            sums[book.category][0] += book.stock_count
+            sums[book.category][1] += book.stock_count * book.price
+        for category, prices in entries.items():
+            if prices:
+                self.prices[category].add_many(prices)
+                totals = self.totals[category]
+                totals.count += len(prices)
+                totals.total_stock += sums[category][0]
+                totals.inventory_value += sums[category][1]
+
+    def remove(self, book : Book)-> None:
+        self.prices[book.category].remove(book.price, book.id)
+        self._count(book, -1)
+
+    def update(self, old : Book, new : Book)-> None:
+        if (old.price, old.category) != (new.price, new.category):
+            self.prices[old.category].remove(old.price, old.id)
+            self.prices[new.category].add(new.price, new.id)
+        self._count(old, -1)
+        self._count(new, 1)
+
+    def between(self, category : Categories, low : float, high : float, offset : int = 0, limit : int = 50)-> list[int]:
+        return self.prices[category].between(low, high, offset, limit)
+
+    def summary(self)-> dict[Categories, CategoryStats]:
+        # rounded copies, a long run of += / -= on floats drifts in the last digits
+        return {
+            category: totals.model_copy(update={"inventory_value": round(totals.inventory_value, 2)})
+            for category, totals in self.totals.items()
+        }
@@ -0,0 +1,154 @@
+# Compact column storage for the books: one typed array per field instead of one pydantic
+# model per book. Book models are only built when a row leaves the store (API boundary).
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterator, Optional
+from schemas.Book import Book, Categories
+
+CATEGORIES = list(Categories) # category column stores the position in this list
+
+
+class StringTable:
+    """Interned strings with reference counts, the columns only keep the position."""
+
+    def __init__(self):
+        self.strings : list[Optional[str]] = []
+        self.refs = array("I")
+        self.positions : dict[str, int] = {}
+        self.free : list[int] = [] # released slots, reused first
+
+    def intern(self, value : str)-> int:
+        pos = self.positions.get(value)
+        if pos is None:
+            if self.free:
+                pos = self.free.pop()
+                self.strings[pos] = value
+            else:
+                pos = len(self.strings)
+                self.strings.append(value)
+                self.refs.append(0)
+            self.positions[value] = pos
+        self.refs[pos] += 1
+        return pos
+
+    def release(self, pos : int)-> None:
+        self.refs[pos] -= 1
+        if self.refs[pos] == 0:
+            del self.positions[self.strings[pos]]
+            self.strings[pos] = None
+            self.free.append(pos)
+
+    def __getitem__(self, pos : int)-> str:
+        return self.strings[pos]
+
+    def copy(self)-> "StringTable":
+        table = StringTable()
+        table.strings = self.strings.copy()
+        table.refs = array("I", self.refs)
+        table.positions = self.positions.copy()
+        table.free = self.free.copy()
+        return table
+
+
+class BookStore:
+    def __init__(self):
+        # One row per book, sorted by id (ids only grow) so a row is found by bisection
+        self.ids = array("q")
+        self.price = array("d")
+        self.stock_count = array("q")
+        self.category = array("B")
+        self.title = array("I")
+        self.author = array("I")
+        self.version = array("Q") # bumped on every write to the row
+        self.strings = StringTable() # titles and authors
+
+    def __len__(self)-> int:
+        return len(self.ids)
+
+    def __contains__(self, id : int)-> bool:
+        return self._row(id) is not None
+
+    def _row(self, id : int)-> Optional[int]:
+        row = bisect_left(self.ids, id)
+        if row < len(self.ids) and self.ids[row] == id:
+            return row
+        return None
+
+    def _book(self, row : int)-> Book:
+        # The values were validated on the way in, no need to do it again
+        return Book.model_construct(
+            id=self.ids[row],
+            title=self.strings[self.title[row]],
+            author=self.strings[self.author[row]],
+            price=self.price[row],
+            stock_count=self.stock_count[row],
+            category=CATEGORIES[self.category[row]],
+        )
+
+    def get(self, id : int)-> Optional[Book]:
+        row = self._row(id)
+        return None if row is None else self._book(row)
+
+    def stock(self, id : int)-> Optional[tuple[int, int]]:
+        """(stock_count, version) of a book, without building the model."""
+        row = self._row(id)
+        return None if row is None else (self.stock_count[row], self.version[row])
+
+    def version_of(self, id : int)-> Optional[int]:
+        row = self._row(id)
+        return None if row is None else self.version[row]
+
+    def page(self, after : int = 0, limit : int = 50)-> list[Book]:
+        start = bisect_right(self.ids, after)
+        return [self._book(row) for row in range(start, min(start + limit, len(self.ids)))]
+
+    def copy(self)-> "BookStore":
+        """Independent copy of the rows (a snapshot writes it out while the writes go on)."""
+        store = BookStore()
+        for column in ("ids", "price", "stock_count", "category", "title", "author", "version"):
+            setattr(store, column, array(getattr(self, column).typecode, getattr(self, column)))
+        store.strings = self.strings.copy()
+        return store
+
+    def __iter__(self)-> Iterator[Book]:
+        for row in range(len(self.ids)):
+            yield self._book(row)
+
+    def append(self, book : Book)-> None:
+        if self.ids and book.id <= self.ids[-1]:
+            raise ValueError(f"Book id {book.id} is not above the last id {self.ids[-1]}")
+        self.ids.append(book.id)
+        self.price.append(book.price)
+        self.stock_count.append(book.stock_count)
+        self.category.append(CATEGORIES.index(book.category))
+        self.title.append(self.strings.intern(book.title))
+        self.author.append(self.strings.intern(book.author))
+        self.version.append(1)
+
+    def update(self, id : int, fields : dict)-> Book:
+        row = self._row(id)
+        if row is None:
+            raise KeyError(id)
+        for field, value in fields.items():
+            if field in ("title", "author"):
+                column = getattr(self, field)
+                self.strings.release(column[row])
+                column[row] = self.strings.intern(value)
+            elif field == "category":
+                self.category[row] = CATEGORIES.index(value)
+            else:
+                getattr(self, field)[row] = value
+        self.version[row] += 1
+        return self._book(row)
+
+    def delete(self, id : int)-> Book:
+        row = self._row(id)
+        if row is None:
+            raise KeyError(id)
+        book = self._book(row)
+        self.strings.release(self.title[row])
+        self.strings.release(self.author[row])
+        for column in (self.ids, self.price, self.stock_count, self.category, self.title, self.author,
+                       self.version):
+            del column[row] # memmove of the tail, cheap even at millions of rows
+        return book
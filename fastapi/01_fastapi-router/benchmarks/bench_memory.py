@@ -0,0 +1,78 @@
+"""
+Memory used by the books: dict of pydantic models vs the column store, then the whole
+DataBase the app runs (the store plus the title/author/category indexes, the search index and
+the price index), where the columns are only part of the cost.
+
+    python benchmarks/bench_memory.py --books 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "01_fastapi_router"))
+
+from db import LOAD_BATCH, DataBase
+from schemas.Book import Book, Categories
+from store import BookStore
+
+CATEGORIES = list(Categories)
+
+
+def books(count):
+    for i in range(count):
+        yield Book(id=i + 1, title=f"Book title number {i}", author=f"Author {i % 5000}",
+                   price=i % 100 + 0.99, stock_count=i % 50, category=CATEGORIES[i % 3])
+
+
+def dict_of_models(count):
+    return {book.id: book for book in books(count)}
+
+
+def column_store(count):
+    store = BookStore()
+    for book in books(count):
+        store.append(book)
+    return store
+
+
+def database(count):
+    # as open_log loads a snapshot: _put_many by batches
+    db = DataBase()
+    new = books(count)
+    while batch := list(islice(new, LOAD_BATCH)):
+        db._put_many(batch)
+    return db
+
+
+def measure(label, build, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    layout = build(count)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<28} {size / 2**20:9.1f} MiB {size / count:8.0f} B/book {elapsed:7.2f} s to build")
+    del layout
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1_000_000)
+    args = parser.parse_args()
+    models = measure("dict[int, Book]", dict_of_models, args.books)
+    columns = measure("BookStore", column_store, args.books)
+    whole = measure("DataBase (store + indexes)", database, args.books)
+    # the indexes are the same whatever holds the books: the store saves models - columns per book, not 6x
+    print(f"indexes on top of the store {(whole - columns) / args.books:8.0f} B/book, "
+          f"the same DataBase over a dict of models about {(whole - columns + models) / args.books:.0f} B/book")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Write overhead and restart time of the append-only log + snapshot persistence.
+
+    python benchmarks/bench_persistence.py --books 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "01_fastapi_router"))
+
+from db import DataBase
+from persistence import BookLog
+from schemas.Book import BookCreate
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<45} {time.perf_counter() - start:8.2f} s")
+    return result
+
+
+def fill(db, books):
+    slowest = 0.0
+    for i in range(books):
+        book = BookCreate(title=f"Book {i}", author=f"Author {i % 1000}",
+                          price=i % 100, stock_count=i % 50, category="fiction")
+        start = time.perf_counter()
+        db.add(book)
+        slowest = max(slowest, time.perf_counter() - start)
+    return slowest
+
+
+def touch(db, books, updates):
+    for i in range(updates):
+        db.update(i % books + 1, {"stock_count": i % 7})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--tail", type=int, default=10_000, help="log records written after the last snapshot")
+    parser.add_argument("--snapshot-every", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        slowest = timed(f"add {args.books} books, in memory", lambda: fill(DataBase(), args.books))
+        print(f"{'  slowest add':<45} {slowest * 1e3:8.2f} ms")
+
+        # snapshot_every is out of reach, so the whole history stays in the log
+        never = args.books * 10
+        db = DataBase()
+        db.open_log(BookLog(directory, snapshot_every=never))
+        slowest = timed(f"add {args.books} books, with log", lambda: fill(db, args.books))
+        print(f"{'  slowest add':<45} {slowest * 1e3:8.2f} ms")
+        touch(db, args.books, args.tail)
+        db.close_log()
+
+        db = DataBase()
+        timed("restart, full log replay", lambda: db.open_log(BookLog(directory, snapshot_every=never)))
+        timed("snapshot", db.snapshot)
+        touch(db, args.books, args.tail)
+        db.close_log()
+        timed(f"restart, snapshot + {args.tail} record tail", lambda: DataBase().open_log(BookLog(directory)))
+
+        # Snapshots taken by the writes themselves: written on a thread, a write only waits
+        # for the copy of the columns
+        with tempfile.TemporaryDirectory() as other:
+            db = DataBase()
+            db.open_log(BookLog(other, snapshot_every=args.snapshot_every))
+            slowest = timed(f"add {args.books} books, snapshot every {args.snapshot_every}", lambda: fill(db, args.books))
+            print(f"{'  slowest add':<45} {slowest * 1e3:8.2f} ms")
+            db.close_log()
+
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"{'files on disk':<45} {size / 2**20:8.1f} MiB")
+
+if __name__ == "__main__":
+    main()
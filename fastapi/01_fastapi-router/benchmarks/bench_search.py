@@ -0,0 +1,65 @@
+"""
+Search latency on a large catalog, straight on the SearchIndex (no HTTP).
+
+    python benchmarks/bench_search.py --books 1000000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "01_fastapi_router"))
+
+from search import SearchIndex
+
+Book = namedtuple("Book", ["id", "title", "author"])
+
+
+def words(count, rng):
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    title_words, author_words = words(50_000, rng), words(5_000, rng)
+    books = [Book(id, " ".join(rng.choices(title_words, k=rng.randint(1, 5))), " ".join(rng.choices(author_words, k=2)))
+             for id in range(1, args.books + 1)]
+    index = SearchIndex()
+    start = time.perf_counter()
+    for book in books:
+        index.add(*book)
+    print(f"index {args.books} books one by one: {time.perf_counter() - start:.1f} s, {len(index.vocabulary)} tokens")
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.add_many(books) # snapshot load, bulk import
+    print(f"index {args.books} books, add_many: {time.perf_counter() - start:.1f} s")
+
+    queries = {
+        "one word": [rng.choice(title_words) for _ in range(args.queries)],
+        "two words": [f"{rng.choice(title_words)} {rng.choice(author_words)}" for _ in range(args.queries)],
+        "prefix (3 chars)": [rng.choice(title_words)[:3] for _ in range(args.queries)],
+        "word + prefix": [f"{rng.choice(author_words)} {rng.choice(title_words)[:4]}" for _ in range(args.queries)],
+        # every completion is tested against the books of the word, the worst case is one letter
+        "word + 1 char": [f"{rng.choice(author_words)} {rng.choice(string.ascii_lowercase)}" for _ in range(args.queries)],
+    }
+    for label, batch in queries.items():
+        timings = []
+        for query in batch:
+            start = time.perf_counter()
+            index.search(query, limit=10, book=lambda id: books[id - 1]) # as DataBase.search
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{label:<18} p50 {timings[len(timings) // 2] * 1e3:6.3f} ms   "
+              f"p99 {timings[int(len(timings) * 0.99)] * 1e3:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Throughput of the Books API at 1/4/8 uvicorn workers, for a backend.
+Mixed load: 80% GET /Books/{id}, 10% GET /Books/ pages, 10% POST /Books/reserve. Needs httpx.
+
+    python benchmarks/bench_workers.py --backend sqlite --workers 1 4 8
+    python benchmarks/bench_workers.py --backend memory --workers 1   # one worker only: no shared data
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "01_fastapi_router")
+
+
+async def wait_ready(client):
+    for _ in range(100):
+        try:
+            await client.get("/Books/", params={"limit": 1})
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def load(url, books, seconds, concurrency):
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        await wait_ready(client)
+        for i in range(books):
+            await client.post("/Books/", json={"title": f"Bench book {i}", "author": f"Author {i % 50}",
+                                               "price": i % 40 + 0.5, "stock_count": 10**6, "category": "fiction"})
+        ids = [book["id"] for book in (await client.get("/Books/", params={"limit": books})).json()["Books"].values()]
+        latencies = []
+        deadline = time.perf_counter() + seconds
+
+        async def user(rng):
+            while time.perf_counter() < deadline:
+                roll = rng.random()
+                start = time.perf_counter()
+                if roll < 0.8:
+                    await client.get(f"/Books/{rng.choice(ids)}")
+                elif roll < 0.9:
+                    await client.get("/Books/", params={"cursor": rng.choice(ids), "limit": 20})
+                else:
+                    await client.post("/Books/reserve", json={"items": [{"id": rng.choice(ids), "quantity": 1}]})
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(user(random.Random(n)) for n in range(concurrency)))
+        latencies.sort()
+        return len(latencies) / seconds, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="sqlite")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--books", type=int, default=1_000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8800)
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, "BOOKS_BACKEND": args.backend,
+                   "BOOKS_SQLITE_PATH": os.path.join(directory, "books.db")}
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+                 "--workers", str(workers), "--no-access-log", "--log-level", "warning"],
+                cwd=APP_DIR, env=env,
+            )
+            try:
+                rate, p50, p99 = asyncio.run(load(f"http://127.0.0.1:{args.port}", args.books,
+                                                  args.seconds, args.concurrency))
+            finally:
+                server.terminate()
+                server.wait()
+        print(f"{args.backend:<7} {workers} worker(s): {rate:8.0f} req/s   "
+              f"p50 {p50 * 1e3:6.1f} ms   p99 {p99 * 1e3:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
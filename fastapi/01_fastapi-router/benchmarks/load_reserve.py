@@ -0,0 +1,66 @@
+"""
+Load test for POST /Books/reserve: hundreds of concurrent checkouts on the same books
+must never sell more copies than the stock. Needs httpx (pip install httpx).
+
+    python benchmarks/load_reserve.py --requests 500 --stock 100
+    python benchmarks/load_reserve.py --url http://localhost:8000   # against a running server
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "01_fastapi_router"))
+
+
+async def run(client, args):
+    ids = []
+    for i in range(args.books):
+        response = await client.post("/Books/", json={
+            "title": f"Load test book {time.time_ns()} {i}", "author": "Load test",
+            "price": 10, "stock_count": args.stock, "category": "fiction",
+        })
+        ids.append(response.json()["added"]["id"])
+
+    async def checkout(n):
+        # every cart takes one copy of each book, half of them in reverse order
+        items = [{"id": id, "quantity": 1} for id in (ids if n % 2 else ids[::-1])]
+        response = await client.post("/Books/reserve", json={"items": items})
+        return response.status_code
+
+    start = time.perf_counter()
+    codes = await asyncio.gather(*(checkout(n) for n in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    sold = codes.count(200)
+    stocks = [(await client.get(f"/Books/{id}")).json()["stock_count"] for id in ids]
+    print(f"{args.requests} concurrent carts in {elapsed:.2f} s ({args.requests / elapsed:.0f} req/s)")
+    print(f"reserved: {sold}, out of stock (409): {codes.count(409)}, other: {len(codes) - sold - codes.count(409)}")
+    print(f"stock left: {stocks}")
+    assert sold == min(args.requests, args.stock), "oversold or lost a reservation"
+    assert all(stock == args.stock - sold for stock in stocks), "stock doesn't match the reservations"
+    print("OK, no overselling")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="running server, the app is served in process otherwise")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--books", type=int, default=3, help="books in every cart")
+    args = parser.parse_args()
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    async with client:
+        await run(client, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
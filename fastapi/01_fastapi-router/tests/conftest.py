@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The app modules import each other by name, as when main.py runs from its directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "01_fastapi_router"))
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def db(request, tmp_path):
+    # Both backends behind the router, they must behave the same
+    if request.param == "memory":
+        from db import DataBase
+        return DataBase()
+    from sqlite_db import SQLiteDataBase
+    return SQLiteDataBase(str(tmp_path / "books.db"))
@@ -0,0 +1,32 @@
+import pytest
+
+from schemas.Book import BookCreate, Categories
+
+BOOKS = [
+    ("The Quiet Garden", "Jane Doe"),
+    ("Winter Roads", "Jane Doe"),
+    ("Garden of Stone", "Mark Janssen"),
+    ("Doe Season", "Ana Ruiz"),
+    ("Stone Soup", "Jane Doe"),
+]
+
+
+@pytest.fixture
+def books(db):
+    db.add_many([BookCreate(title=title, author=author, price=10.0, stock_count=1, category=Categories.FICTION)
+                 for title, author in BOOKS])
+    return db
+
+
+@pytest.mark.parametrize("query, prefix, expected", [
+    ("doe", True, {1, 2, 4, 5}), # a word of the authors, and of one title
+    ("jan", True, {1, 2, 3, 5}), # a prefix found only in authors
+    ("gard", True, {1, 3}),
+    ("jane gard", True, {1}),
+    ("stone jan", True, {3, 5}),
+    ("garden", False, {1, 3}),
+    ("jan", False, set()), # not a whole word
+])
+def test_search_matches_titles_and_authors(books, query, prefix, expected):
+    # both backends through the db fixture: the same books, the ranking aside
+    assert {book.id for book in books.search(query, limit=50, prefix=prefix)} == expected
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from db import OutOfStock
+from schemas.Book import BookCreate, Categories
+
+
+def add_book(db, title, stock_count):
+    return db.add(BookCreate(title=title, author="Some Author", price=10.0, stock_count=stock_count,
+                             category=Categories.FICTION))
+
+
+def test_reserve_takes_stock(db):
+    first, second = add_book(db, "First", 5), add_book(db, "Second", 3)
+
+    books = db.reserve({first.id: 2, second.id: 3})
+
+    assert [book.stock_count for book in books] == [3, 0]
+    assert db.get(first.id).stock_count == 3
+    assert db.get(second.id).stock_count == 0
+
+
+def test_reserve_is_all_or_nothing(db):
+    first, second = add_book(db, "First", 5), add_book(db, "Second", 1)
+
+    with pytest.raises(OutOfStock) as error:
+        db.reserve({first.id: 2, second.id: 2})
+
+    assert error.value.ids == [second.id]
+    assert db.get(first.id).stock_count == 5 # the book with enough stock is untouched too
+    assert db.get(second.id).stock_count == 1
+
+
+def test_reserve_unknown_book_changes_nothing(db):
+    book = add_book(db, "First", 5)
+
+    with pytest.raises(KeyError):
+        db.reserve({book.id: 1, book.id + 100: 1})
+
+    assert db.get(book.id).stock_count == 5
+
+
+def test_release_gives_stock_back(db):
+    book = add_book(db, "First", 5)
+    db.reserve({book.id: 4})
+
+    db.release({book.id: 4})
+
+    assert db.get(book.id).stock_count == 5
+
+
+def test_concurrent_reserves_never_oversell(db):
+    book = add_book(db, "First", 20)
+    taken = []
+
+    def checkout():
+        try:
+            db.reserve({book.id: 1})
+            taken.append(1)
+        except OutOfStock:
+            pass
+
+    threads = [threading.Thread(target=checkout) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(taken) == 20
+    assert db.get(book.id).stock_count == 0
@@ -0,0 +1,31 @@
+"""
+One-shot import of task.csv (with task.csv.log folded in, if there is one) into the SQLite backend.
+
+    python migrate.py --csv task.csv --sqlite tasks.db
+"""
+
+import argparse
+import sys
+from opr_csv import OpsCSV
+from opr_sqlite import OpsSQLite
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", default=OpsCSV.DATABASE_NAME)
+    parser.add_argument("--sqlite", default="tasks.db")
+    parser.add_argument("--replace", action="store_true", help="delete the tasks already in the database")
+    args = parser.parse_args()
+
+    OpsCSV.DATABASE_NAME = args.csv
+    opr = OpsCSV()
+    tasks = opr.all()
+    try:
+        count = OpsSQLite(args.sqlite).import_tasks(tasks, replace=args.replace, last_id=opr.last_id())
+    except ValueError as error: # database not empty, or an id that is not a number
+        sys.exit(f"Nothing imported: {error}")
+    print(f"{count} tasks imported from {args.csv} into {args.sqlite}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,98 +3,628 @@ NOTE: This project is a learning exercise for FastAPI, Pydantic, and CRUD concep
 Not production-ready. Focus is on experimenting with techniques.
 """
 
+import contextlib
 import csv
-from typing import Optional
-from schemas import Task,TaskID,TaskV2WithID
+import os
+import shutil
+import tempfile
+import threading
+from typing import Iterable,Iterator,Optional
+from schemas import DEFAULT_PRIORITY,TASK_LIST,TASK_V2_LIST,Status,Task,TaskID,TaskV2,TaskV2WithID,task_v2
+import task_index
+import task_log
+from task_log import PUT,DELETE
+from task_changes import ChangeFeed
+from task_facets import FacetIndex
+from task_queue import WorkQueue,rank
+from task_search import TaskSearchIndex
+
+try:
+    import fcntl
+except ImportError: # Windows: no cross-process lock, one worker only
+    fcntl = None
 
 class OpsCSV():
     DATABASE_NAME = "task.csv"
     FIELDS = [
-        "id", "title", "description", "status"
+        "id", "title", "description", "status", "priority"
     ]
-    
+    # "rewrite": every update/delete rewrites task.csv, "log": they are appended to
+    # task.csv.log and a background compaction folds the log into task.csv
+    APPEND_LOG = os.environ.get("TASKS_WRITE_MODE", "rewrite") == "log"
+    COMPACT_RATIO = float(os.environ.get("TASKS_COMPACT_RATIO", 0.5)) # share of dead records
+    COMPACT_MIN_RECORDS = 1000
+
+    def __init__(self):
+        # Parsed copy of the files, reused while their mtime, size and inode don't change
+        # (another worker or a hand edit changes them, then the files are read again)
+        self._tasks : dict[str,TaskID] = {}
+        self._tasks_v2 : Optional[list[TaskV2WithID]] = None
+        self._stamp : Optional[tuple] = None # task.csv and task.csv.log.old
+        self._header : list[str] = OpsCSV.FIELDS # of task.csv, older files have no priority
+        self._log_offset = 0 # task.csv.log is read incrementally, up to here so far
+        self._log_ino : Optional[int] = None
+        self._base_records = 0 # rows in task.csv and task.csv.log.old
+        self._log_records = 0
+        self._max_id : Optional[int] = None # highest id seen since the load, None: not computed yet
+        self._compacting = threading.Lock()
+        # The parsed copy is shared by the threads of storage.AsyncStorage: held while it is read
+        # or changed, not while a write waits on the disk
+        self._memory = threading.RLock()
+        self._index : Optional[tuple] = None # task_index arrays, for single reads on a cold cache
+        self._search : Optional[TaskSearchIndex] = None # built by the first search, then kept up to date
+        self._facets : Optional[FacetIndex] = None # same, for the status/title filters
+        self._queue : Optional[WorkQueue] = None # Incomplete tasks by priority, built by the first claim
+        self._feed : Optional[ChangeFeed] = None # task.csv.changes, read by the writes and changes()
+
+    def _path(self, suffix : str = "") -> str:
+        return OpsCSV.DATABASE_NAME + suffix
+
+    def _file_stamp(self, suffix : str = "") -> Optional[tuple[int,int,int]]:
+        try:
+            stat = os.stat(self._path(suffix))
+        except FileNotFoundError:
+            if suffix:
+                return None
+            raise
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino # a rewrite is a new file (rename)
+
+    def _stamps(self) -> tuple:
+        # the files only a rewrite or a compaction replaces, the log itself only grows
+        return self._file_stamp(), self._file_stamp(".log.old")
+
+    def _cached(self) -> dict[str,TaskID]:
+        stamp = self._stamps()
+        if stamp != self._stamp or not self._catch_up():
+            self._load(stamp)
+        return self._tasks
+
+    def _load(self, stamp : tuple) -> None:
+        with open(OpsCSV.DATABASE_NAME, newline="") as file:
+            # Validated in one call. csv.reader and the header rather than a DictReader, which
+            # costs more than the validation; a row with missing fields is a torn append from
+            # a crash, save() cuts it off
+            reader = csv.reader(file)
+            header = next(reader, OpsCSV.FIELDS)
+            tasks = TASK_LIST.validate_python([dict(zip(header, row)) for row in reader if len(row) == len(header)])
+        self._header = header
+        self._tasks = {task.id: task for task in tasks}
+        self._max_id = None
+        self._search = self._facets = self._queue = None
+        old, _, _ = task_log.read(self._path(".log.old")) # left by a compaction in progress
+        self._fold(old)
+        self._base_records = len(tasks) + len(old)
+        self._log_offset, self._log_ino, self._log_records = 0, None, 0
+        self._catch_up()
+        self._tasks_v2 = None
+        self._stamp = stamp
+
+    def _catch_up(self) -> bool:
+        """Fold the log records appended since the last read, False when the log was replaced."""
+        log = self._file_stamp(".log")
+        if log is None:
+            return self._log_offset == 0
+        if (log[1], log[2]) == (self._log_offset, self._log_ino):
+            return True
+        read = task_log.read(self._path(".log"), self._log_offset, self._log_ino)
+        if read is None:
+            return False
+        rows, self._log_offset, self._log_ino = read
+        self._fold(rows)
+        self._log_records += len(rows)
+        if rows:
+            self._tasks_v2 = None
+        return True
+
+    def _fold(self, rows : list[list[str]]) -> None:
+        for op, id, title, description, status, *priority in rows: # no priority in older records
+            if op == PUT:
+                self._put(self._task(id, title, description, status, *priority))
+            else:
+                self._drop(id)
+
+    @staticmethod
+    def _task(id : str, title : str, description : str, status : str, priority : str = DEFAULT_PRIORITY) -> TaskID:
+        return TaskID(id=id, title=title, description=description, status=status, priority=priority)
+
+    def _put(self, task : TaskID) -> None:
+        old = self._tasks.get(task.id)
+        for index in (self._search, self._facets):
+            if index is not None:
+                if old is not None:
+                    index.remove(old)
+                index.add(task)
+        self._tasks[task.id] = task
+        if self._queue is not None and task.status == Status.INCOMPLETE.value and task.id.isdigit():
+            self._queue.push(int(task.id), task.priority) # the entry from before is dropped when popped
+        if self._max_id is not None and int(task.id) > self._max_id:
+            self._max_id = int(task.id)
+
+    def _drop(self, id : str) -> Optional[TaskID]:
+        task = self._tasks.pop(id, None)
+        for index in (self._search, self._facets):
+            if task is not None and index is not None:
+                index.remove(task)
+        return task
+
+    def _written(self) -> None:
+        # Our own write: the cache is already up to date, only the stamps move
+        self._tasks_v2 = None
+        self._stamp = self._stamps()
+        log = self._file_stamp(".log")
+        self._log_offset, self._log_ino = (log[1], log[2]) if log else (0, None)
+
+    @contextlib.contextmanager
+    def _reading(self) -> Iterator[dict[str,TaskID]]:
+        """The up to date tasks, no other thread changes them while the block runs."""
+        with self._memory:
+            yield self._cached()
+
+    def _get(self, id : str) -> Optional[TaskID]:
+        with self._reading() as tasks:
+            return tasks.get(id)
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self._path(".lock"), "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX) # released when the file is closed
+            yield
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[dict[str,TaskID]]:
+        """Exclusive lock (all workers) around a read-modify-write, yields the up to date tasks."""
+        with self._file_lock():
+            try:
+                with self._memory:
+                    tasks = self._cached()
+                    if not OpsCSV.APPEND_LOG and (self._log_ino or self._stamp[1] or self._header != OpsCSV.FIELDS):
+                        # back in rewrite mode with a log left over: fold it in before appending to task.csv.
+                        # Same for a task.csv without the priority column, save() appends rows with it
+                        self._rewrite(tasks.values())
+                        self._written()
+                yield tasks
+            except BaseException:
+                self._stamp = None # the cache may be half changed, read the files again
+                raise
+
+    def _rewrite(self, tasks : Iterable[TaskID]) -> None:
+        self._replace(*self._write_temp(tasks))
+        for suffix in (".log", ".log.old"): # task.csv holds every change now
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._path(suffix))
+        self._base_records = len(self._tasks)
+        self._log_records = 0
+
+    def _write_temp(self, tasks : Iterable[TaskID]) -> tuple[str,list[tuple[int,int]]]:
+        # Write a temp file next to the CSV, then _replace renames it over the CSV: a crash
+        # leaves either the old file or the new one, never a truncated one
+        directory = os.path.dirname(os.path.abspath(OpsCSV.DATABASE_NAME))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".task-", suffix=".tmp")
+        offsets = [] # (id, offset of its row) for task_index
+        try:
+            with os.fdopen(fd, mode="wb") as csvfile:
+                output = task_log.BytesWriter(csvfile)
+                writer = csv.DictWriter(output, fieldnames=OpsCSV.FIELDS)
+                writer.writeheader()
+                for task in tasks:
+                    if task.id.isdigit():
+                        offsets.append((int(task.id), output.offset))
+                    writer.writerow(task.__dict__) # model_dump() leaves the priority out
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+            shutil.copymode(OpsCSV.DATABASE_NAME, tmp_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path, offsets
+
+    def _replace(self, tmp_path : str, offsets : list[tuple[int,int]]) -> None:
+        try:
+            os.replace(tmp_path, OpsCSV.DATABASE_NAME)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        self._fsync_directory(os.path.dirname(os.path.abspath(OpsCSV.DATABASE_NAME))) # makes the rename durable
+        self._header = OpsCSV.FIELDS
+        stamp = task_index.stamp_of(os.stat(OpsCSV.DATABASE_NAME))
+        task_index.write(self._path(".idx"), task_index.pack(stamp, offsets))
+
+    @staticmethod
+    def _fsync_directory(directory : str) -> None:
+        with contextlib.suppress(OSError, AttributeError): # not possible on Windows
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _change_feed(self) -> ChangeFeed:
+        # Under the file lock, the tasks loaded
+        if self._feed is None or self._feed.path != self._path(".changes"):
+            self._feed = ChangeFeed(self._path(".changes"))
+        if not os.path.exists(self._feed.path):
+            # a new journal starts with the tasks written before it, or since=0 would miss them
+            with self._memory:
+                self._feed.record(list(self._tasks))
+        return self._feed
+
+    def _journal(self, *ids : str) -> None:
+        # Under _locked(), before the write it records: see task_changes
+        self._change_feed().record(ids)
+
+    def _append(self, op : str, task : TaskID) -> None:
+        task_log.append(self._path(".log"), [task_log.record(op, task)])
+        self._log_records += 1
+
+    def _maybe_compact(self) -> None:
+        records = self._base_records + self._log_records
+        if not OpsCSV.APPEND_LOG or records < OpsCSV.COMPACT_MIN_RECORDS:
+            return
+        if 1 - len(self._tasks) / records > OpsCSV.COMPACT_RATIO and self._compacting.acquire(blocking=False):
+            threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        finally:
+            self._compacting.release()
+
+    def compact(self) -> None:
+        """Fold task.csv.log into task.csv. Writers only wait for the two renames, not for the rewrite."""
+        with open(self._path(".log.lock"), "a") as compaction:
+            if fcntl:
+                try:
+                    fcntl.flock(compaction, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError: # another worker is compacting
+                    return
+            with self._locked():
+                # New writes go to a fresh log, the current one is frozen as .log.old.
+                # An .old already there is a compaction that crashed: its records are in tasks too
+                if not os.path.exists(self._path(".log.old")):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.replace(self._path(".log"), self._path(".log.old"))
+                with self._memory:
+                    self._base_records += self._log_records
+                    self._log_records = 0
+                    self._written()
+                    snapshot = list(self._tasks.values())
+            tmp_path, offsets = self._write_temp(snapshot) # no lock: writers keep appending meanwhile
+            with self._locked():
+                # Replaying .old over the new task.csv gives the same state, a crash between
+                # the rename and the unlink is harmless
+                self._replace(tmp_path, offsets)
+                with contextlib.suppress(FileNotFoundError): # folded already if the mode went back to rewrite
+                    os.unlink(self._path(".log.old"))
+                with self._memory:
+                    self._base_records = len(snapshot)
+                    self._written()
+
     def all(self)->list[TaskID]:
-        with open(OpsCSV.DATABASE_NAME) as file:
-            reader = csv.DictReader(file)
-            return [TaskID(**i) for i in reader]
-    
+        with self._reading() as tasks:
+            return list(tasks.values())
+
     def read_all_tasks_v2(self) -> list[TaskV2WithID]:
-        with open(OpsCSV.DATABASE_NAME) as file:
-            reader = csv.DictReader(file)
-            return [TaskV2WithID(**row) for row in reader]
+        with self._reading() as tasks:
+            if self._tasks_v2 is None:
+                self._tasks_v2 = TASK_V2_LIST.validate_python([task.__dict__ for task in tasks.values()]) # see task_v2
+            return self._tasks_v2
+
 
-    
     def get_task_by_id(self, id: str) -> Optional[TaskID]:
-        for task in self.all():
-            if task.id == id:
-                return task
-        return None
-    
-    def get_id(self) -> int:
-        tasks = self.all()
-        if not tasks:
-            return 1
-        return max(int(task.id) for task in tasks) + 1 
-
-    def save(self,task : TaskID)-> None:
-        try:
-            with open(OpsCSV.DATABASE_NAME, mode="a", newline="") as file:
-                witer = csv.DictWriter(file,fieldnames=OpsCSV.FIELDS)
-                witer.writerow(task.model_dump())
-        except FileNotFoundError :
+        stamp = self._stamps()
+        if stamp != self._stamp and stamp[1] is None and self._file_stamp(".log") is None:
+            # cold or stale cache (another worker wrote), no log to fold in:
+            # read the one row through the index instead of parsing the whole file
+            return self._lookup(id, stamp[0])
+        return self._get(id)
+
+    def stream(self, status : Optional[str] = None, title : Optional[str] = None) -> Iterator[TaskID]:
+        """Tasks read lazily from the files, in the order of all(), without the parsed copy:
+        memory stays flat however big task.csv is (the log is bounded by the compaction)."""
+        with contextlib.ExitStack() as files:
+            with self._file_lock():
+                # Writes are renames or appends: an open file is a snapshot up to its current
+                # size, the lock is only held to open the files at the same point
+                base = files.enter_context(open(OpsCSV.DATABASE_NAME, "rb"))
+                logs = [files.enter_context(open(self._path(suffix), "rb")) for suffix in (".log.old", ".log")
+                        if os.path.exists(self._path(suffix))]
+                sizes = [os.fstat(file.fileno()).st_size for file in (base, *logs)]
+            changed : dict[str,Optional[dict]] = {} # id -> latest row from the log, None: deleted
+            moved = set() # deleted then created again: at the end, as _drop + _put leave it in the cache
+            for file, size in zip(logs, sizes[1:]):
+                for op, id, *fields in task_log.records(file.read(size)):
+                    if op == DELETE:
+                        changed.pop(id, None)
+                        changed[id] = None
+                        moved.add(id)
+                    else:
+                        changed[id] = dict(zip(OpsCSV.FIELDS, [id, *fields]))
+
+            for row in csv.DictReader(self._lines(base, sizes[0])):
+                if None in row.values(): # torn append, see _load
+                    continue
+                if row["id"] in changed:
+                    if row["id"] in moved:
+                        continue
+                    yield from self._matching([changed.pop(row["id"])], status, title)
+                    continue
+                if (status is None or row["status"] == status) and (title is None or row["title"] == title):
+                    yield TaskID(**row)
+            yield from self._matching(changed.values(), status, title)
+
+    def _matching(self, rows : Iterable[Optional[dict]], status : Optional[str], title : Optional[str]) -> Iterator[TaskID]:
+        # rows from the log, None: deleted
+        for row in rows:
+            if row is not None and (status is None or row["status"] == status) and (title is None or row["title"] == title):
+                yield self._task(**row)
+
+    @staticmethod
+    def _lines(file, size : int) -> Iterator[str]:
+        position = 0
+        for line in file:
+            position += len(line)
+            if position > size: # appended after the snapshot
+                return
+            yield line.decode()
+
+    def search(self, query : str, offset : int = 0, limit : int = 50) -> list[TaskID]:
+        with self._reading() as tasks:
+            if self._search is None:
+                self._search = TaskSearchIndex()
+                self._search.add_many(tasks.values())
+            return [tasks[id] for id in self._search.search(query, offset, limit, task=tasks.get)]
+
+    def _facet_index(self, tasks : dict[str,TaskID]) -> FacetIndex:
+        # under _reading()
+        if self._facets is None:
+            self._facets = FacetIndex()
+            self._facets.add_many(tasks.values())
+        return self._facets
+
+    def filter(self, status : Optional[str] = None, title : Optional[str] = None) -> list[TaskID]:
+        """Tasks matching every filter given, in the order of all(). Cost: the size of the result."""
+        with self._reading() as tasks:
+            if status is None and title is None:
+                return list(tasks.values())
+            ids = self._facet_index(tasks).ids(status=status, title=title)
+            if len(ids) * 32 > len(tasks):
+                # a big share of the tasks: testing each one costs less than sorting the ids,
+                # the result is of the size of the table anyway
+                return [task for task in tasks.values()
+                        if (status is None or task.status == status) and (title is None or task.title == title)]
+            # ids are handed out in order and rows appended, so id order is the order of all()
+            return [tasks[id] for id in sorted(ids, key=lambda id: (len(id), id))] # "9" before "10"
+
+    def facets(self, field : str, limit : Optional[int] = None) -> dict[str,int]:
+        """Tasks per status (or title), most common first, without reading the tasks."""
+        with self._reading() as tasks:
+            return self._facet_index(tasks).counts(field, limit)
+
+    def changes(self, since : Optional[int] = None) -> dict:
+        """Tasks created, updated (upserts) or removed (deletes, their ids) after change since,
+        and the sequence to ask from next time. reset: since is None or older than the journal
+        keeps, upserts is then every task and the client starts over from them."""
+        # The lock: no write half done, its journal row and its change are both visible or neither
+        with self._file_lock(), self._reading() as tasks:
+            feed = self._change_feed()
+            feed.catch_up()
+            if since is None or not feed.first - 1 <= since <= feed.last:
+                return {"seq": feed.last, "reset": True, "upserts": list(tasks.values()), "deletes": []}
+            ids = feed.since(since)
+            return {"seq": feed.last, "reset": False,
+                    "upserts": [tasks[id] for id in ids if id in tasks],
+                    "deletes": [id for id in ids if id not in tasks]}
+
+    def get_by_status(self, status: str) -> list[TaskID]:
+        return self.filter(status=status)
+
+    def get_by_title(self, title: str) -> list[TaskID]:
+        return self.filter(title=title)
+
+    def _lookup(self, id : str, stamp : tuple) -> Optional[TaskID]:
+        if self._index is None or self._index[0] != stamp:
+            self._index = task_index.load(self._path(".idx"))
+        if self._index is None or self._index[0] != stamp:
+            # stale: rebuilt from a scan of the ids, still much cheaper than parsing every task
+            values = task_index.pack(*task_index.build(OpsCSV.DATABASE_NAME))
+            with contextlib.suppress(OSError): # read-only directory, keep it in memory only
+                task_index.write(self._path(".idx"), values)
+            self._index = task_index.unpack(values)
+        index_stamp, ids, offsets = self._index
+        if index_stamp != stamp or not id.isdigit(): # task.csv changed meanwhile, or not an id we index
+            return self._get(id)
+        offset = task_index.find(ids, offsets, int(id))
+        if offset is None:
             return None
+        row = task_index.read_row(OpsCSV.DATABASE_NAME, stamp, offset)
+        if row is None or len(row) != len(self._header) or row[0] != id:
+            return self._get(id)
+        return TaskID(**dict(zip(self._header, row)))
+
+    @staticmethod
+    def _read_sequence(file) -> int:
+        file.seek(0)
+        try:
+            return int(file.read(32))
+        except ValueError: # new file (from before the sequence): seeded from the tasks
+            return 0
 
-    
-    def create_task(self, task : Task)-> dict[str,TaskID]:
-        id = self.get_id()
-        task_with_id = TaskID(id = str(id), **task.model_dump())
-        self.save(task_with_id)
+    def last_id(self, sequence = None) -> int:
+        """Highest id given out so far, removed tasks included."""
+        if sequence is not None:
+            last = self._read_sequence(sequence)
+        else:
+            try:
+                with open(self._path(".seq"), "rb") as file:
+                    last = self._read_sequence(file)
+            except FileNotFoundError:
+                last = 0
+        with self._reading() as tasks:
+            if self._max_id is None: # one scan per load of the files
+                self._max_id = max((int(id) for id in tasks if id.isdigit()), default=0)
+            # rows added by hand, or a sequence lost in a crash (it is not fsynced)
+            return max(last, self._max_id)
+
+    def get_id(self, count : int = 1) -> int:
+        """First of count new ids. Call it under _locked(): task.csv.seq is shared by the workers,
+        and the id of a removed task is never given again."""
+        fd = os.open(self._path(".seq"), os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+b", buffering=0) as sequence:
+            first = self.last_id(sequence) + 1
+            # fixed width, overwritten in place: one small write, never a shorter number
+            # followed by the end of the previous one
+            sequence.seek(0)
+            sequence.write(b"%020d\n" % (first + count - 1))
+        return first
+
+    def save(self,*tasks : TaskID)-> None:
+        # Call it under _locked(), appends are not atomic
+        with open(OpsCSV.DATABASE_NAME, mode="rb+") as file:
+            before = task_index.stamp_of(os.fstat(file.fileno()))
+            task_log.repair_tail(file, (len(OpsCSV.FIELDS),))
+            output = task_log.BytesWriter(file, file.seek(0, os.SEEK_END))
+            witer = csv.DictWriter(output,fieldnames=OpsCSV.FIELDS)
+            offsets = [] # (id, offset of its row) for task_index
+            for task in tasks:
+                if task.id.isdigit():
+                    offsets.append((int(task.id), output.offset))
+                witer.writerow(task.__dict__)
+            file.flush()
+            os.fsync(file.fileno())
+            after = task_index.stamp_of(os.fstat(file.fileno()))
+        task_index.append(self._path(".idx"), before, after, offsets)
+        self._base_records += len(tasks)
+
+
+    def create_task(self, task : Task | TaskV2)-> dict[str,TaskID]:
+        with self._locked():
+            id = self.get_id() # under the lock: two workers can't get the same id
+            task_with_id = TaskID(id = str(id), **task.model_dump())
+            self._journal(task_with_id.id)
+            if OpsCSV.APPEND_LOG:
+                self._append(PUT, task_with_id)
+            else:
+                self.save(task_with_id)
+            with self._memory:
+                self._put(task_with_id)
+                self._written()
         return {"Created Tasks": task_with_id}
-    
+
     #change this to "Read all → modify → rewrite file" this is a exprement not a real function
     def modify_task(self,id : str, task:dict)->Optional[dict]:
         #This what it will caontain -> task_to_update : TaskID | None = None  this is the modern "task_to_update : Optional[TaskID] = None"
-        task_to_update = self.get_task_by_id(id)
-        tasks = self.all()
-        Update = False
-        
-        with open(OpsCSV.DATABASE_NAME, mode="w", newline="") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=OpsCSV.FIELDS)
-            writer.writeheader()
-
-            for tsk in tasks:
-                if tsk.id == id:
-                    for field , value in task.items():
-                        if value != None:
-                            setattr(tsk,field,value)
-                    Update = True
-                writer.writerow(tsk.model_dump())
-                    
-        if Update:
-            return {'Updated':task_to_update, "Change" : task}
-        else:
-            return None
-        
+        with self._locked() as tasks:
+            if id not in tasks:
+                return None
+            # a new model rather than setattr: a compaction or a reader may be using the old one
+            task_to_update = tasks[id]
+            updated = task_to_update.model_copy(update={field: value for field, value in task.items() if value != None})
+            with self._memory:
+                self._put(updated)
+            self._journal(id)
+            if OpsCSV.APPEND_LOG:
+                self._append(PUT, updated)
+            else:
+                with self._memory:
+                    snapshot = list(self._tasks.values())
+                self._rewrite(snapshot)
+            with self._memory:
+                self._written()
+        self._maybe_compact()
+        return {'Updated':task_to_update, "Change" : task}
+
     def remove_task(self,id: str) -> Optional[Task]:
-        tasks = self.all()
-        Deleted = False
-        tsk_deleted = None
+        with self._locked() as tasks:
+            if id not in tasks:
+                return None
+            with self._memory:
+                tsk_deleted = self._drop(id)
+            self._journal(id)
+            if OpsCSV.APPEND_LOG:
+                self._append(DELETE, tsk_deleted)
+            else:
+                with self._memory:
+                    snapshot = list(self._tasks.values())
+                self._rewrite(snapshot)
+            with self._memory:
+                self._written()
+        self._maybe_compact()
 
-        with open(OpsCSV.DATABASE_NAME, mode="w", newline="") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=OpsCSV.FIELDS)
-            writer.writeheader()
+        # Return Task without the ID
+        task_dict = tsk_deleted.model_dump()
+        del task_dict["id"]
+        return Task(**task_dict)
 
-            for task in tasks:
-                if task.id == id:
-                    Deleted = True
-                    tsk_deleted = task
+    def apply_batch(self, creates : list[Task], updates : list[tuple[str,dict]], deletes : list[str]) -> dict[str,list[dict]]:
+        """Creates, then updates, then deletes in one read-modify-write: one lock, one log append
+        or one rewrite of task.csv for the whole batch. A result per item, in order."""
+        with self._locked():
+            results = self._apply(creates, updates, deletes)
+        self._maybe_compact()
+        return results
+
+    def _apply(self, creates : list[Task], updates : list[tuple[str,dict]], deletes : list[str]) -> dict[str,list[dict]]:
+        # apply_batch under _locked()
+        results : dict[str,list[dict]] = {"create": [], "update": [], "delete": []}
+        changes : list[tuple[str,TaskID]] = []
+        with self._memory:
+            first_id = self.get_id(len(creates)) if creates else 0
+            for n, task in enumerate(creates):
+                task_with_id = TaskID(id=str(first_id + n), **task.model_dump())
+                self._put(task_with_id)
+                changes.append((PUT, task_with_id))
+                results["create"].append({"id": task_with_id.id, "status": 201, "task": task_with_id})
+            for id, task in updates:
+                if id not in self._tasks: # as PUT /Tasks/{id}: 200 and no task
+                    results["update"].append({"id": id, "status": 200, "task": None})
+                    continue
+                updated = self._tasks[id].model_copy(update={field: value for field, value in task.items() if value != None})
+                self._put(updated)
+                changes.append((PUT, updated))
+                results["update"].append({"id": id, "status": 200, "task": updated})
+            for id in deletes:
+                deleted = self._drop(id)
+                if deleted is None: # as DELETE /Tasks/{id}
+                    results["delete"].append({"id": id, "status": 400, "detail": "task not found"})
                     continue
-                writer.writerow(task.model_dump())
-        
-        if Deleted:
-            # Return Task without the ID
-            task_dict = tsk_deleted.model_dump()
-            del task_dict["id"]
-            return Task(**task_dict)
-        
-        return None
+                changes.append((DELETE, deleted))
+                results["delete"].append({"id": id, "status": 200, "task": deleted})
+            rewrite = not OpsCSV.APPEND_LOG and len(changes) > len(creates) # something else than appended rows
+            snapshot = list(self._tasks.values()) if rewrite else None
+        if not changes:
+            return results
+        self._journal(*(task.id for _, task in changes))
+        if OpsCSV.APPEND_LOG:
+            task_log.append(self._path(".log"), [task_log.record(op, task) for op, task in changes])
+            self._log_records += len(changes)
+        elif rewrite:
+            self._rewrite(snapshot)
+        else:
+            self.save(*(task for _, task in changes))
+        with self._memory:
+            self._written()
+        return results
+
+    def claim(self, count : int) -> list[TaskV2WithID]:
+        """The count next Incomplete tasks, highest priority then oldest first, marked Ongoing in
+        the same write: two workers (threads or processes) never get the same task."""
+        def waiting(id : int) -> Optional[int]:
+            task = tasks.get(str(id))
+            return rank(task.priority) if task is not None and task.status == Status.INCOMPLETE.value else None
+
+        with self._locked() as tasks:
+            with self._memory:
+                ids = self._work_queue(tasks).pop(count, waiting)
+            results = self._apply([], [(str(id), {"status": Status.ONGOING.value}) for id in ids], [])
+        self._maybe_compact()
+        return [task_v2(item["task"]) for item in results["update"]]
+
+    def _work_queue(self, tasks : dict[str,TaskID]) -> WorkQueue:
+        # under _reading(); built again once stale entries outnumber the tasks
+        if self._queue is None or len(self._queue) > 2 * len(tasks):
+            self._queue = WorkQueue()
+            self._queue.add_many((int(task.id), task.priority) for task in tasks.values()
+                                 if task.status == Status.INCOMPLETE.value and task.id.isdigit())
+        return self._queue
@@ -0,0 +1,320 @@
+"""
+SQLite backend, same methods as OpsCSV. One database file shared by every uvicorn worker
+(WAL: readers don't block the writer), the lookups OpsCSV does in memory are indexes here.
+"""
+
+import sqlite3
+import threading
+from typing import Iterable,Iterator,Optional
+from schemas import DEFAULT_PRIORITY,TASK_V2_LIST,Status,Task,TaskID,TaskV2,TaskV2WithID
+from task_changes import KEEP
+from task_facets import FacetIndex
+from task_queue import PRIORITIES,rank
+from task_search import TaskSearchIndex
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY, -- given by next_ids from task_seq, like OpsCSV.get_id
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority TEXT DEFAULT '{DEFAULT_PRIORITY}' -- for v2, NULL ranks after every known one
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS tasks_title ON tasks(title);
+
+-- last id given out, removed tasks included: their ids are never given again
+CREATE TABLE IF NOT EXISTS task_seq (last INTEGER NOT NULL);
+INSERT INTO task_seq SELECT coalesce(max(id), 0) FROM tasks WHERE NOT EXISTS (SELECT 1 FROM task_seq);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+    title, description, status, content='tasks', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS tasks_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts(rowid, title, description, status) VALUES (new.id, new.title, new.description, new.status);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tasks_update AFTER UPDATE ON tasks BEGIN
+    INSERT INTO tasks_fts(tasks_fts, rowid, title, description, status)
+        VALUES ('delete', old.id, old.title, old.description, old.status);
+    INSERT INTO tasks_fts(rowid, title, description, status) VALUES (new.id, new.title, new.description, new.status);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tasks_delete AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts(tasks_fts, rowid, title, description, status)
+        VALUES ('delete', old.id, old.title, old.description, old.status);
+END;
+
+-- change journal for changes(), as task.csv.changes: AUTOINCREMENT, a seq is never given twice
+CREATE TABLE IF NOT EXISTS task_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, id INTEGER NOT NULL);
+CREATE TRIGGER IF NOT EXISTS tasks_insert_change AFTER INSERT ON tasks BEGIN
+    INSERT INTO task_changes(id) VALUES (new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_update_change AFTER UPDATE ON tasks BEGIN
+    INSERT INTO task_changes(id) VALUES (new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_delete_change AFTER DELETE ON tasks BEGIN
+    INSERT INTO task_changes(id) VALUES (old.id);
+END;
+CREATE TRIGGER IF NOT EXISTS task_changes_trim AFTER INSERT ON task_changes WHEN new.seq % 1000 = 0 BEGIN
+    DELETE FROM task_changes WHERE seq <= new.seq - {KEEP};
+END;
+"""
+
+# task_queue.rank() in SQL, the order of claim()
+RANK = "CASE priority " + " ".join(f"WHEN '{priority}' THEN {n}" for n, priority in enumerate(PRIORITIES)) + f" ELSE {len(PRIORITIES)} END"
+# Separate from SCHEMA: a database from before the priority column gets it first. Partial, only the
+# waiting tasks: the status is a literal in claim() too, SQLite can't use it for a bound parameter
+CLAIM_INDEX = f"CREATE INDEX IF NOT EXISTS tasks_claim ON tasks({RANK}, id) WHERE status = '{Status.INCOMPLETE.value}'"
+
+COLUMNS = "id, title, description, status, priority"
+NAMES = COLUMNS.split(", ")
+UPDATABLE = ("title", "description", "status", "priority") # the fields of InsertTaskV2
+
+
+class OpsSQLite():
+    def __init__(self, path : str):
+        # One connection per process, the lock covers the threadpool used by sync routes
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL") # durable at the WAL checkpoint, not every commit
+            indexed = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone()
+            self.conn.executescript(f"BEGIN IMMEDIATE; {SCHEMA} COMMIT;")
+            if not indexed: # database from before the search index: fill it from the tasks
+                self.conn.execute("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+            self.conn.execute("BEGIN IMMEDIATE")
+            if "priority" not in [column for _, column, *_ in self.conn.execute("PRAGMA table_info(tasks)")]:
+                # database from before the priority: every task gets the default one
+                self.conn.execute(f"ALTER TABLE tasks ADD COLUMN priority TEXT DEFAULT '{DEFAULT_PRIORITY}'")
+            self.conn.execute(CLAIM_INDEX)
+            if not self.conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'task_changes'").fetchone():
+                # journal never written (database from before it): a change per task already
+                # there, or since=0 would miss them
+                self.conn.execute("INSERT INTO task_changes(id) SELECT id FROM tasks ORDER BY id")
+            self.conn.execute("COMMIT")
+
+    @staticmethod
+    def _task(row : tuple) -> TaskID:
+        id, title, description, status, priority = row
+        return TaskID(id=str(id), title=title, description=description, status=status, priority=priority)
+
+    @staticmethod
+    def _tasks_v2(rows : list[tuple]) -> list[TaskV2WithID]:
+        return TASK_V2_LIST.validate_python([dict(zip(NAMES, row)) for row in rows])
+
+    def _next_ids(self, count : int) -> int:
+        # Inside a write transaction. max(id): rows inserted with their own id (import_tasks)
+        (last,) = self.conn.execute(
+            "UPDATE task_seq SET last = max(last, (SELECT coalesce(max(id), 0) FROM tasks)) + ? RETURNING last",
+            (count,),
+        ).fetchone()
+        return last - count + 1
+
+    def _insert(self, task : Task | TaskV2, id : int) -> TaskID:
+        created = TaskID(id=str(id), **task.model_dump()) # the default priority for a v1 task
+        self.conn.execute(f"INSERT INTO tasks ({COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                          (id, created.title, created.description, created.status, created.priority))
+        return created
+
+    @staticmethod
+    def _where(status : Optional[str], title : Optional[str]) -> tuple[str,tuple]:
+        # the filters given, combined (the index on one column, then the other tested)
+        filters = {column: value for column, value in (("status", status), ("title", title)) if value is not None}
+        return (" WHERE " + " AND ".join(f"{column} = ?" for column in filters) if filters else ""), tuple(filters.values())
+
+    def _tasks(self, sql : str, params : tuple = ()) -> list[TaskID]:
+        with self.lock:
+            return [self._task(row) for row in self.conn.execute(sql, params)]
+
+    def all(self) -> list[TaskID]:
+        return self._tasks(f"SELECT {COLUMNS} FROM tasks ORDER BY id")
+
+    def read_all_tasks_v2(self) -> list[TaskV2WithID]:
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {COLUMNS} FROM tasks ORDER BY id").fetchall()
+        return self._tasks_v2(rows)
+
+    def get_task_by_id(self, id: str) -> Optional[TaskID]:
+        if not id.isdigit():
+            return None
+        with self.lock:
+            row = self.conn.execute(f"SELECT {COLUMNS} FROM tasks WHERE id = ?", (int(id),)).fetchone()
+        return None if row is None else self._task(row)
+
+    def stream(self, status : Optional[str] = None, title : Optional[str] = None) -> Iterator[TaskID]:
+        """Tasks read lazily, on a connection of their own: the shared one (and its lock) stays free."""
+        where, params = self._where(status, title)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            # one statement, one read transaction: a consistent snapshot (WAL) while the client reads
+            cursor = conn.execute(f"SELECT {COLUMNS} FROM tasks{where} ORDER BY id", params)
+            while rows := cursor.fetchmany(1000):
+                for row in rows:
+                    yield self._task(row)
+        finally:
+            conn.close()
+
+    def search(self, query : str, offset : int = 0, limit : int = 50) -> list[TaskID]:
+        terms = TaskSearchIndex.parse(query)
+        if not terms:
+            return []
+        # Quoted terms (no FTS syntax from the client), implicit AND, last one as a prefix
+        match = " ".join(f'{field + " : " if field else ""}"{term}"' for field, term in terms) + "*"
+        weights = ", ".join(str(float(weight)) for weight in TaskSearchIndex.FIELDS.values())
+        return self._tasks(
+            f"SELECT {', '.join('tasks.' + column for column in NAMES)} "
+            "FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid "
+            f"WHERE tasks_fts MATCH ? ORDER BY bm25(tasks_fts, {weights}), tasks.id LIMIT ? OFFSET ?",
+            (match, limit, offset),
+        )
+
+    def filter(self, status : Optional[str] = None, title : Optional[str] = None) -> list[TaskID]:
+        where, params = self._where(status, title)
+        return self._tasks(f"SELECT {COLUMNS} FROM tasks{where} ORDER BY id", params)
+
+    def facets(self, field : str, limit : Optional[int] = None) -> dict[str,int]:
+        if field not in FacetIndex.FIELDS:
+            raise ValueError(f"No facet for {field!r}")
+        # counted from the index on the column, the rows are not read
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {field}, count(*) AS tasks FROM tasks GROUP BY {field} ORDER BY tasks DESC, {field} LIMIT ?",
+                (-1 if limit is None else limit,),
+            ).fetchall()
+        return dict(rows)
+
+    def changes(self, since : Optional[int] = None) -> dict:
+        """Same as OpsCSV.changes, from the task_changes table."""
+        with self.lock:
+            self.conn.execute("BEGIN") # one read transaction: the journal and the tasks at the same point
+            try:
+                (last,) = self.conn.execute(
+                    "SELECT coalesce(max(seq), 0) FROM sqlite_sequence WHERE name = 'task_changes'").fetchone()
+                (first,) = self.conn.execute("SELECT coalesce(min(seq), ?) FROM task_changes", (last + 1,)).fetchone()
+                if since is None or not first - 1 <= since <= last:
+                    rows = self.conn.execute(f"SELECT {COLUMNS} FROM tasks ORDER BY id").fetchall()
+                    return {"seq": last, "reset": True, "upserts": [self._task(row) for row in rows], "deletes": []}
+                rows = self.conn.execute(
+                    "SELECT changed.id, title, description, status, priority FROM "
+                    "(SELECT id, max(seq) AS seq FROM task_changes WHERE seq > ? GROUP BY id) AS changed "
+                    "LEFT JOIN tasks ON tasks.id = changed.id ORDER BY changed.seq",
+                    (since,),
+                ).fetchall()
+            finally:
+                self.conn.execute("COMMIT")
+        return {"seq": last, "reset": False,
+                "upserts": [self._task(row) for row in rows if row[1] is not None],
+                "deletes": [str(row[0]) for row in rows if row[1] is None]}
+
+    def get_by_status(self, status: str) -> list[TaskID]:
+        return self.filter(status=status)
+
+    def get_by_title(self, title: str) -> list[TaskID]:
+        return self.filter(title=title)
+
+    def create_task(self, task : Task | TaskV2) -> dict[str,TaskID]:
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                created = self._insert(task, self._next_ids(1))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return {"Created Tasks": created}
+
+    def modify_task(self, id : str, task : dict) -> Optional[dict]:
+        changes = {field: value for field, value in task.items() if value != None and field in UPDATABLE}
+        with self.lock:
+            # IMMEDIATE: no other worker writes between reading the old task and the update
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(f"SELECT {COLUMNS} FROM tasks WHERE id = ?", (int(id),)).fetchone()
+                if row is not None and changes:
+                    assignments = ", ".join(f"{field} = ?" for field in changes)
+                    self.conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", (*changes.values(), int(id)))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {'Updated': self._task(row), "Change": task}
+
+    def remove_task(self, id : str) -> Optional[Task]:
+        with self.lock:
+            row = self.conn.execute(
+                "DELETE FROM tasks WHERE id = ? RETURNING title, description, status", (int(id),)
+            ).fetchone()
+        if row is None:
+            return None
+        title, description, status = row
+        return Task(title=title, description=description, status=status)
+
+    def apply_batch(self, creates : list[Task], updates : list[tuple[str,dict]], deletes : list[str]) -> dict[str,list[dict]]:
+        """Creates, then updates, then deletes in one transaction, a result per item."""
+        results : dict[str,list[dict]] = {"create": [], "update": [], "delete": []}
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                first_id = self._next_ids(len(creates)) if creates else 0
+                for n, task in enumerate(creates):
+                    created = self._insert(task, first_id + n)
+                    results["create"].append({"id": created.id, "status": 201, "task": created})
+                for id, task in updates:
+                    changes = {field: value for field, value in task.items() if value != None and field in UPDATABLE}
+                    if changes:
+                        assignments = ", ".join(f"{field} = ?" for field in changes)
+                        row = self.conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ? RETURNING {COLUMNS}",
+                                                (*changes.values(), int(id))).fetchone()
+                    else:
+                        row = self.conn.execute(f"SELECT {COLUMNS} FROM tasks WHERE id = ?", (int(id),)).fetchone()
+                    results["update"].append({"id": id, "status": 200, "task": None if row is None else self._task(row)})
+                for id in deletes:
+                    row = self.conn.execute(f"DELETE FROM tasks WHERE id = ? RETURNING {COLUMNS}", (int(id),)).fetchone()
+                    results["delete"].append({"id": id, "status": 400, "detail": "task not found"} if row is None
+                                             else {"id": id, "status": 200, "task": self._task(row)})
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return results
+
+    def claim(self, count : int) -> list[TaskV2WithID]:
+        """Same as OpsCSV.claim: one UPDATE, the next Incomplete tasks (read in order off
+        CLAIM_INDEX, no sort) marked Ongoing. SQLite runs one writer at a time."""
+        with self.lock:
+            rows = self.conn.execute(
+                "UPDATE tasks SET status = ? WHERE id IN "
+                # INDEXED BY: without ANALYZE statistics the planner prefers tasks_status, then sorts
+                f"(SELECT id FROM tasks INDEXED BY tasks_claim WHERE status = '{Status.INCOMPLETE.value}' "
+                f"ORDER BY {RANK}, id LIMIT ?) "
+                f"RETURNING {COLUMNS}",
+                (Status.ONGOING.value, count),
+            ).fetchall()
+        return self._tasks_v2(sorted(rows, key=lambda row: (rank(row[4]), row[0]))) # RETURNING has no order
+
+    def import_tasks(self, tasks : Iterable[TaskID], replace : bool = False, last_id : int = 0) -> int:
+        """Insert tasks with their ids in one transaction, for migrate.py. last_id: the highest id
+        the CSV store gave out, so ids of tasks removed there are not given again either."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if replace:
+                    self.conn.execute("DELETE FROM tasks")
+                elif self.conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone():
+                    raise ValueError("The database already has tasks, use --replace to overwrite them")
+                cursor = self.conn.executemany(
+                    f"INSERT INTO tasks ({COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                    ((int(task.id), task.title, task.description, task.status, task.priority) for task in tasks),
+                )
+                self.conn.execute("UPDATE task_seq SET last = max(last, ?)", (last_id,))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
@@ -1,7 +1,11 @@
+import csv
+import io
+from itertools import islice
 from fastapi import APIRouter, HTTPException,Path,Body,Query
-from opr_csv import OpsCSV
-from schemas import Task,TaskID,Status,InsertTask,TaskV2WithID
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from storage import AsyncStorage,open_storage
+from schemas import Task,TaskID,Status,InsertTask,InsertTaskV2,TaskV2,TaskV2WithID,TaskBatch,TaskBatchResult,TaskChanges,MAX_BATCH,task_v2
+from typing import Iterator,Literal,Optional
 from pydantic import BaseModel
 
 
@@ -10,48 +14,119 @@ router = APIRouter(
 )
 
 
-opr = OpsCSV()
+opr = AsyncStorage(open_storage()) # storage calls run on a thread pool, not on the event loop
 
 
 
+StreamFormat = Literal["ndjson", "csv"]
+
 class TaskFilter(BaseModel):
     status: Optional[str] = None
     title: Optional[str] = None
+    # Not a filter, but FastAPI reads a query model only when it is the only query parameter
+    format: Optional[StreamFormat] = None # stream ndjson/csv instead of one JSON list
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+STREAM_BATCH = 1000 # tasks per chunk sent
+
+def encode(tasks : Iterator[BaseModel], format : StreamFormat, fields : list[str]) -> Iterator[bytes]:
+    # One chunk per STREAM_BATCH tasks: only that many models are alive at a time
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == "csv":
+        writer.writerow(fields)
+    while batch := list(islice(tasks, STREAM_BATCH)):
+        if format == "ndjson":
+            yield b"".join(task.model_dump_json().encode() + b"\n" for task in batch)
+            continue
+        writer.writerows([getattr(task, field) for field in fields] for task in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell(): # csv header of an empty result
+        yield buffer.getvalue().encode()
 
 @router.get('/',response_model=list[TaskID])
 async def get_all(
     filter: TaskFilter = Query(default=TaskFilter())
 
 ):
-    tasks = opr.all()
-    if filter.status:
-        return [tsk for tsk in tasks if tsk.status == filter.status]
-    if filter.title:
-        return [tsk for tsk in tasks if tsk.title == filter.title]
-    return tasks
+    # both filters combine; an empty one (?status=) is no filter, as before
+    status, title = filter.status or None, filter.title or None
+    if filter.format:
+        # the filters are applied while the rows are read
+        tasks = opr.stream(status=status, title=title)
+        return StreamingResponse(opr.iterate(encode(tasks, filter.format, ["id", "title", "description", "status"])),
+                                 media_type=MEDIA_TYPES[filter.format])
+    if status or title:
+        return await opr.filter(status=status, title=title)
+    return await opr.all()
 
 @router.get('/sreach',response_model=list[TaskID])
 async def sreach(
-    keyword : str = Query(...)
+    keyword : str = Query(..., description="words that must all match, title:word for one field, the last word may be a prefix"),
+    offset : int = Query(0, ge=0),
+    limit : int = Query(50, ge=1, le=500),
     ):
 
-    return [
-        task
-        for task in opr.all()
-        if keyword in (task.status + task.description + task.title)
-    ]
+    return await opr.search(keyword, offset=offset, limit=limit)
+
+@router.get('/facets')
+async def facets(
+    field : Literal["status", "title"] = Query("status"),
+    limit : int = Query(100, ge=1, le=1000),
+    ) -> dict[str,int]:
+    # counts from the status/title indexes, most common first
+    return await opr.facets(field, limit)
+
+@router.get('/changes',response_model=TaskChanges)
+async def changes(
+    since : Optional[int] = Query(None, ge=0, description="seq of the previous call, none for every task"),
+    ):
+    # delta sync: only what changed after since instead of GET /Tasks/ in full
+    return await opr.changes(since)
 
 @router.get(
     "/v2/tasks",
     response_model=list[TaskV2WithID]
 )
-def get_tasks_v2():
-    tasks = opr.read_all_tasks_v2()
+async def get_tasks_v2(format: Optional[StreamFormat] = Query(None)):
+    if format:
+        tasks = (task_v2(task) for task in opr.stream())
+        return StreamingResponse(opr.iterate(encode(tasks, format, ["id", "title", "description", "status", "priority"])),
+                                 media_type=MEDIA_TYPES[format])
+    tasks = await opr.read_all_tasks_v2()
     return tasks
 
+@router.post('/v2/tasks',response_model=TaskV2WithID)
+async def create_task_v2(task : TaskV2 = Body(...)):
+    # as POST /Tasks/, with the priority claims are ranked by
+    if task.status not in [status.value for status in Status]:
+        raise HTTPException(
+            status_code=400, detail="Invalid status"
+        )
+    created = await opr.create_task(task)
+    return task_v2(created["Created Tasks"])
+
+@router.put('/v2/tasks/{id_task}',response_model=TaskV2WithID)
+async def update_task_v2(id_task : int = Path(...),
+                         task : InsertTaskV2 = Body(...)):
+    results = await opr.apply_batch([], [(str(id_task), task.model_dump())], [])
+    updated = results["update"][0]["task"]
+    if updated is None:
+        raise HTTPException(
+            status_code=404, detail="task not found"
+        )
+    return task_v2(updated)
+
+@router.post('/v2/queue/claim',response_model=list[TaskV2WithID])
+async def claim(count : int = Query(1, ge=1, le=MAX_BATCH)):
+    # the next Incomplete tasks by priority, returned as Ongoing: no other worker gets them
+    return await opr.claim(count)
+
 @router.get('/{id_task}')
 async def get_by_ID(id_task:int = Path(...))-> Optional[TaskID]:
-    task = opr.get_task_by_id(str(id_task))
+    task = await opr.get_task_by_id(str(id_task))
     if not task:
         raise HTTPException(
             status_code=404, detail="task not found"
@@ -60,21 +135,35 @@ async def get_by_ID(id_task:int = Path(...))-> Optional[TaskID]:
 
 @router.post('/',response_model=dict[str,TaskID])
 async def create_task(task : Task = Body(...)):
-    if isinstance(task.status,Status):
-        return opr.create_task(task)
+    if task.status in [status.value for status in Status]: # task.status is a str, never a Status
+        return await opr.create_task(task)
     else:
         raise HTTPException(
             status_code=400, detail="Invalid status"
         )
 
+@router.post('/batch',response_model=TaskBatchResult)
+async def batch(batch : TaskBatch = Body(...)):
+    # One pass of the store for the whole batch (creates, then updates, then deletes) instead
+    # of a lock and a write per task. Invalid items get their error, the others are applied
+    statuses = [status.value for status in Status]
+    valid = [task for task in batch.create if task.status in statuses]
+    results = await opr.apply_batch(valid,
+                                    [(str(task.id), task.model_dump(exclude={"id"})) for task in batch.update],
+                                    [str(id) for id in batch.delete])
+    created = iter(results["create"])
+    results["create"] = [next(created) if task.status in statuses else {"status": 400, "detail": "Invalid status"}
+                         for task in batch.create]
+    return results
+
 @router.put('/{id_task}')
 async def update_task(id_task : int = Path(...),
                       task : InsertTask = Body(...)):
-    return opr.modify_task(str(id_task),task.model_dump())
+    return await opr.modify_task(str(id_task),task.model_dump())
 
 @router.delete('/{id_task}')
 async def delete(id_task : int = Path(...)):
-    task = opr.remove_task(str(id_task))
+    task = await opr.remove_task(str(id_task))
 
     if not task:
         raise HTTPException(
@@ -4,7 +4,7 @@ NOTE: This project is a learning exercise for FastAPI, Pydantic, and CRUD concep
 Not production-ready. Focus is on experimenting with techniques.
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel,Field,TypeAdapter,field_validator
 from enum import Enum
 from typing import Optional
 
@@ -23,10 +23,30 @@ class TaskV2(BaseModel):
 class TaskV2WithID(TaskV2):
     id: int
 
+DEFAULT_PRIORITY = TaskV2.model_fields["priority"].default # tasks created through v1 have none
+
 
 # because id wont be used in the create of the task it will be auto 
 class TaskID(Task):
     id : str
+    # Stored for v2 (see task_v2), not part of the v1 output
+    priority : Optional[str] = Field(default=DEFAULT_PRIORITY, exclude=True)
+
+    @field_validator("priority", mode="before")
+    @classmethod
+    def _no_priority(cls, value):
+        return None if value == "" else value # how the CSV holds a None
+
+
+# One validation call for a whole list: the loop runs in pydantic-core, not in Python
+# (model_construct walks the fields in Python and is slower, bench_validation.py)
+TASK_LIST = TypeAdapter(list[TaskID])
+TASK_V2_LIST = TypeAdapter(list[TaskV2WithID])
+
+
+def task_v2(task : TaskID) -> TaskV2WithID:
+    # __dict__: every field, the priority included (model_dump() leaves it out); the id "3" becomes 3
+    return TaskV2WithID.model_validate(task.__dict__)
 
 
 class Status(str,Enum):
@@ -38,3 +58,33 @@ class InsertTask(BaseModel):
     description : Optional[str] = None
     status: Optional[str] = None
 
+class InsertTaskV2(InsertTask):
+    priority: Optional[str] = None
+
+
+MAX_BATCH = 1000 # items per list of a batch
+
+class TaskPatch(InsertTask):
+    id: int
+
+class TaskBatch(BaseModel):
+    create: list[Task] = Field(default=[], max_length=MAX_BATCH)
+    update: list[TaskPatch] = Field(default=[], max_length=MAX_BATCH)
+    delete: list[int] = Field(default=[], max_length=MAX_BATCH)
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    status: int # HTTP status the single item endpoint would have returned
+    task: Optional[TaskID] = None # created, updated or deleted task
+    detail: Optional[str] = None
+
+class TaskBatchResult(BaseModel):
+    create: list[BatchItem] = []
+    update: list[BatchItem] = []
+    delete: list[BatchItem] = []
+
+class TaskChanges(BaseModel):
+    seq: int # pass it as since next time
+    reset: bool # since too old (or not given): upserts holds every task, drop the local copy
+    upserts: list[TaskID] = [] # created or updated since, in their current state
+    deletes: list[str] = [] # ids removed since
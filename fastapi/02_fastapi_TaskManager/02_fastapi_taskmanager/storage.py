@@ -0,0 +1,126 @@
+"""
+Storage the routers depend on, picked at startup: TASKS_BACKEND=csv (default) or sqlite.
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, Optional, Protocol, TypeVar
+from schemas import Task,TaskID,TaskV2,TaskV2WithID
+
+T = TypeVar("T")
+IO_THREADS = int(os.environ.get("TASKS_IO_THREADS", 8)) # 0: run the calls on the event loop
+_DONE = object()
+
+
+class TaskStorage(Protocol):
+    """What routers.py needs from a storage backend, see OpsCSV and OpsSQLite."""
+    def all(self) -> list[TaskID]: ...
+    def read_all_tasks_v2(self) -> list[TaskV2WithID]: ...
+    def get_task_by_id(self, id: str) -> Optional[TaskID]: ...
+    def get_by_status(self, status: str) -> list[TaskID]: ...
+    def get_by_title(self, title: str) -> list[TaskID]: ...
+    def filter(self, status : Optional[str] = None, title : Optional[str] = None) -> list[TaskID]: ...
+    def facets(self, field : str, limit : Optional[int] = None) -> dict[str,int]: ...
+    def search(self, query : str, offset : int = 0, limit : int = 50) -> list[TaskID]: ...
+    def changes(self, since : Optional[int] = None) -> dict: ...
+    def stream(self, status : Optional[str] = None, title : Optional[str] = None) -> Iterator[TaskID]: ...
+    def create_task(self, task : Task | TaskV2) -> dict[str,TaskID]: ...
+    def modify_task(self, id : str, task : dict) -> Optional[dict]: ...
+    def remove_task(self, id : str) -> Optional[Task]: ...
+    def apply_batch(self, creates : list[Task], updates : list[tuple[str,dict]], deletes : list[str]) -> dict[str,list[dict]]: ...
+    def claim(self, count : int) -> list[TaskV2WithID]: ...
+
+
+def open_storage() -> TaskStorage:
+    # TASKS_BACKEND=sqlite is one database file for all the uvicorn workers
+    backend = os.environ.get("TASKS_BACKEND", "csv")
+    if backend == "sqlite":
+        from opr_sqlite import OpsSQLite
+        return OpsSQLite(os.environ.get("TASKS_SQLITE_PATH", "tasks.db"))
+    if backend != "csv":
+        raise ValueError(f"Unknown TASKS_BACKEND {backend!r}, use csv or sqlite")
+    from opr_csv import OpsCSV
+    return OpsCSV()
+
+
+class AsyncStorage:
+    """A TaskStorage for async routes: every call runs on a bounded thread pool, so the
+    file and database work never blocks the event loop (and the other clients with it)."""
+    def __init__(self, storage : TaskStorage, threads : int = IO_THREADS):
+        self.storage = storage
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="tasks-io") if threads else None
+
+    async def _run(self, func : Callable[..., T], *args, **kwargs) -> T:
+        if self.executor is None:
+            return func(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def all(self) -> list[TaskID]:
+        return await self._run(self.storage.all)
+
+    async def read_all_tasks_v2(self) -> list[TaskV2WithID]:
+        return await self._run(self.storage.read_all_tasks_v2)
+
+    async def get_task_by_id(self, id: str) -> Optional[TaskID]:
+        return await self._run(self.storage.get_task_by_id, id)
+
+    async def get_by_status(self, status: str) -> list[TaskID]:
+        return await self._run(self.storage.get_by_status, status)
+
+    async def get_by_title(self, title: str) -> list[TaskID]:
+        return await self._run(self.storage.get_by_title, title)
+
+    async def filter(self, status : Optional[str] = None, title : Optional[str] = None) -> list[TaskID]:
+        return await self._run(self.storage.filter, status, title)
+
+    async def facets(self, field : str, limit : Optional[int] = None) -> dict[str,int]:
+        return await self._run(self.storage.facets, field, limit)
+
+    async def search(self, query : str, offset : int = 0, limit : int = 50) -> list[TaskID]:
+        return await self._run(self.storage.search, query, offset, limit)
+
+    async def changes(self, since : Optional[int] = None) -> dict:
+        return await self._run(self.storage.changes, since)
+
+    def stream(self, status : Optional[str] = None, title : Optional[str] = None) -> Iterator[TaskID]:
+        # lazy, nothing is read before iterate() pulls the first item
+        return self.storage.stream(status=status, title=title)
+
+    async def iterate(self, items : Iterator[T]) -> AsyncIterator[T]:
+        """The items of a blocking iterator (stream() and its encoding), each next() on the pool."""
+        pending : Optional[Future] = None # the last next() handed to the pool
+        try:
+            while True:
+                if self.executor is None:
+                    item = next(items, _DONE)
+                else:
+                    pending = self.executor.submit(next, items, _DONE)
+                    item = await asyncio.wrap_future(pending)
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            close = getattr(items, "close", None) # client gone: release the files now, not at gc
+            if close and pending is not None:
+                # once that next() is over: a cancelled await leaves it running on the pool,
+                # and a generator can't be closed while it runs
+                pending.add_done_callback(lambda _: close())
+            elif close:
+                close()
+
+    async def create_task(self, task : Task | TaskV2) -> dict[str,TaskID]:
+        return await self._run(self.storage.create_task, task)
+
+    async def modify_task(self, id : str, task : dict) -> Optional[dict]:
+        return await self._run(self.storage.modify_task, id, task)
+
+    async def remove_task(self, id : str) -> Optional[Task]:
+        return await self._run(self.storage.remove_task, id)
+
+    async def apply_batch(self, creates : list[Task], updates : list[tuple[str,dict]], deletes : list[str]) -> dict[str,list[dict]]:
+        return await self._run(self.storage.apply_batch, creates, updates, deletes)
+
+    async def claim(self, count : int) -> list[TaskV2WithID]:
+        return await self._run(self.storage.claim, count)
@@ -0,0 +1,86 @@
+"""
+Change journal next to task.csv (task.csv.changes) for GET /Tasks/changes?since=N: one row
+per task a write touches, numbered by a sequence that only goes up. No header.
+
+    41,3        <- change 41 touched task 3 (created, updated or removed)
+    42,7
+
+Only ids are kept: a client gets the current state of each task changed after N, or its id
+as deleted when the task is gone. So a row is appended before the write it records, and a
+crash between the two leaves a change that changed nothing, never a change missed.
+The newest KEEP rows are kept, a client further behind gets every task again. A new journal
+starts with a row per task already there, so tasks older than the journal are changes too.
+"""
+
+import bisect
+import contextlib
+import csv
+import os
+import tempfile
+from array import array
+from typing import Iterable
+import task_log
+
+KEEP = int(os.environ.get("TASKS_CHANGES_KEEP", 100_000))
+WIDTHS = (2,) # fields of a row
+
+
+class ChangeFeed:
+    def __init__(self, path : str):
+        self.path = path
+        self.seqs = array("q") # increasing, for the bisect
+        self.ids : list[str] = []
+        self.offset = 0 # the file is read incrementally, like task.csv.log
+        self.ino = None
+
+    @property
+    def last(self) -> int:
+        """Sequence of the newest change, 0 before the first one."""
+        return self.seqs[-1] if self.seqs else 0
+
+    @property
+    def first(self) -> int:
+        """Oldest change still in the journal: since=first - 1 is the furthest back a delta goes."""
+        return self.seqs[0] if self.seqs else self.last + 1
+
+    def catch_up(self) -> None:
+        read = task_log.read(self.path, self.offset, self.ino, WIDTHS)
+        if read is None: # trimmed meanwhile (or removed by hand): read again from the start
+            self.seqs, self.ids = array("q"), []
+            read = task_log.read(self.path, 0, None, WIDTHS)
+        rows, self.offset, self.ino = read
+        for seq, id in rows:
+            self.seqs.append(int(seq))
+            self.ids.append(id)
+
+    def record(self, ids : Iterable[str]) -> None:
+        """Append a change per id. Under the OpsCSV lock: the sequence is shared by the workers."""
+        self.catch_up()
+        rows = [[str(seq), id] for seq, id in enumerate(ids, self.last + 1)]
+        task_log.append(self.path, rows, WIDTHS) # read back by the next catch_up
+        if len(self.seqs) + len(rows) > 2 * KEEP:
+            self.trim()
+
+    def since(self, seq : int) -> list[str]:
+        """Ids changed after seq, once each, in the order of their latest change."""
+        changed = self.ids[bisect.bisect_right(self.seqs, seq):]
+        return list(reversed(dict.fromkeys(reversed(changed))))
+
+    def trim(self) -> None:
+        # Keep the newest KEEP rows: a new file renamed over the journal, the other workers
+        # see another inode and read it again
+        self.catch_up()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".changes-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode="w", newline="") as file:
+                csv.writer(file).writerows(zip(self.seqs[-KEEP:], self.ids[-KEEP:]))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        self.offset, self.ino = 0, None
+        self.seqs, self.ids = array("q"), []
@@ -0,0 +1,49 @@
+"""
+Hash indexes on status and title for the GET /Tasks/ filters: value -> ids of the tasks holding
+it. Filters are combined by intersecting their sets, starting from the smallest, so a filtered
+read costs the size of the result, not of the table. Counts per value are the set sizes.
+"""
+
+import heapq
+from typing import Iterable,Optional
+from schemas import TaskID
+
+
+class FacetIndex:
+    FIELDS = ("status", "title")
+
+    def __init__(self):
+        self.values : dict[str,dict[str,set[str]]] = {field: {} for field in FacetIndex.FIELDS}
+
+    def add(self, task : TaskID) -> None:
+        for field, values in self.values.items():
+            ids = values.get(getattr(task, field))
+            if ids is None:
+                ids = values[getattr(task, field)] = set()
+            ids.add(task.id)
+
+    def add_many(self, tasks : Iterable[TaskID]) -> None:
+        for task in tasks:
+            self.add(task)
+
+    def remove(self, task : TaskID) -> None:
+        for field, values in self.values.items():
+            ids = values.get(getattr(task, field))
+            if ids is None:
+                continue
+            ids.discard(task.id)
+            if not ids:
+                del values[getattr(task, field)]
+
+    def ids(self, **filters : Optional[str]) -> set[str]:
+        """Ids of the tasks matching every filter that is not None (at least one).
+        Read only: with one filter it is the set of the index itself, not a copy."""
+        sets = sorted((self.values[field].get(value, set()) for field, value in filters.items() if value is not None),
+                      key=len)
+        return sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+
+    def counts(self, field : str, limit : Optional[int] = None) -> dict[str,int]:
+        """Tasks per value of field, most common first."""
+        counts = ((value, len(ids)) for value, ids in self.values[field].items())
+        key = lambda count: (-count[1], count[0])
+        return dict(sorted(counts, key=key) if limit is None else heapq.nsmallest(limit, counts, key=key))
@@ -0,0 +1,132 @@
+"""
+Sidecar index next to task.csv (task.csv.idx): task id -> byte offset of its row, so one
+task is read with a seek instead of parsing the whole file.
+
+Binary, int64: the (mtime_ns, size, inode) of the task.csv it describes, then (id, offset)
+pairs sorted by id. An index whose stamp is not the one of task.csv is stale and rebuilt.
+"""
+
+import contextlib
+import csv
+import io
+import os
+import tempfile
+from array import array
+from bisect import bisect_right
+from typing import Iterable,Optional
+
+Stamp = tuple[int,int,int]
+HEADER = 3 # int64 values before the pairs
+
+
+def stamp_of(stat : os.stat_result) -> Stamp:
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def rows(data : bytes, start : int = 0) -> Iterable[tuple[int,bytes]]:
+    """(offset, row) of every complete row, a quoted field may span lines."""
+    offset = row_start = start
+    quotes = 0
+    for line in data[start:].split(b"\n")[:-1]: # the piece after the last newline is a torn row
+        offset += len(line) + 1
+        quotes += line.count(b'"')
+        if quotes % 2: # inside a quoted field
+            continue
+        yield row_start, data[row_start:offset]
+        row_start, quotes = offset, 0
+
+
+def build(path : str) -> tuple[Stamp,list[tuple[int,int]]]:
+    # Only the id of each row is decoded: a scan of the bytes, no csv module, no models
+    with open(path, "rb") as file:
+        stamp = stamp_of(os.fstat(file.fileno()))
+        data = file.read(stamp[1])
+    pairs = []
+    header = data.find(b"\n") + 1
+    for offset, row in rows(data, header):
+        id = row.split(b",", 1)[0]
+        if id.isdigit():
+            pairs.append((int(id), offset))
+    return stamp, pairs
+
+
+def pack(stamp : Stamp, pairs : list[tuple[int,int]]) -> array:
+    values = array("q", stamp)
+    for pair in sorted(pairs): # same id twice (hand edit): the last row wins, as in the cache
+        values.extend(pair)
+    return values
+
+
+def unpack(values : array) -> tuple[Stamp,array,array]:
+    return tuple(values[:HEADER]), values[HEADER::2], values[HEADER + 1::2]
+
+
+def write(path : str, values : array) -> None:
+    # Temp file + rename: a reader never sees a half written index
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".task-", suffix=".idx")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            values.tofile(file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+
+def load(path : str) -> Optional[tuple[Stamp,array,array]]:
+    values = array("q")
+    try:
+        with open(path, "rb") as file:
+            values.frombytes(file.read())
+    except (FileNotFoundError, ValueError): # ValueError: truncated file
+        return None
+    if len(values) < HEADER or (len(values) - HEADER) % 2:
+        return None
+    return unpack(values)
+
+
+def append(path : str, old : Stamp, new : Stamp, pairs : list[tuple[int,int]]) -> None:
+    """Add the (id, offset) of the rows appended to task.csv, when the index was up to date before the append."""
+    with contextlib.suppress(FileNotFoundError), open(path, "r+b") as file:
+        values = array("q")
+        values.frombytes(file.read(HEADER * 8))
+        if tuple(values) != old:
+            return
+        end = file.seek(0, os.SEEK_END)
+        if end > HEADER * 8:
+            file.seek(end - 16)
+            last = array("q")
+            last.frombytes(file.read(16))
+            if pairs and pairs[0][0] < last[0]: # would break the order, let the next reader rebuild it
+                return
+        if any(a[0] > b[0] for a, b in zip(pairs, pairs[1:])):
+            return
+        file.seek(end)
+        array("q", [value for pair in pairs for value in pair]).tofile(file)
+        # header last: a crash before it leaves a stale (rebuilt) index, not a wrong one
+        file.seek(0)
+        array("q", new).tofile(file)
+
+
+def find(ids : array, offsets : array, id : int) -> Optional[int]:
+    position = bisect_right(ids, id) - 1
+    if position >= 0 and ids[position] == id:
+        return offsets[position]
+    return None
+
+
+def read_row(path : str, stamp : Stamp, offset : int) -> Optional[list[str]]:
+    """The row at offset, None when task.csv is not the file the index describes anymore."""
+    with open(path, "rb") as file:
+        if stamp_of(os.fstat(file.fileno())) != stamp:
+            return None
+        file.seek(offset)
+        data = b""
+        while True:
+            line = file.readline()
+            data += line
+            if not line or data.count(b'"') % 2 == 0:
+                break
+    return next(csv.reader(io.StringIO(data.decode(), newline="")), None)
@@ -0,0 +1,86 @@
+"""
+Append-only change log next to task.csv (task.csv.log): one row per write, so an update
+or a delete costs one appended line instead of rewriting every task. No header.
+
+    put,3,Write docs,README,Ongoing,high    <- a created task, or its new state after an update
+    del,3,,,,                               <- tombstone
+"""
+
+import csv
+import io
+import os
+from typing import Optional
+from schemas import TaskID
+
+PUT, DELETE = "put", "del"
+LOG_FIELDS = ["op", "id", "title", "description", "status", "priority"]
+WIDTHS = (len(LOG_FIELDS), len(LOG_FIELDS) - 1) # complete records, the second from before the priority
+
+
+def record(op : str, task : TaskID) -> list[str]:
+    if op == DELETE:
+        return [DELETE, task.id, "", "", "", ""]
+    return [PUT, task.id, task.title, task.description, task.status, task.priority or ""]
+
+
+def append(path : str, records : list[list[str]], widths : tuple[int,...] = WIDTHS) -> None:
+    # Call it under the OpsCSV lock, appends from two workers would interleave
+    with open(path, mode="ab+") as file:
+        repair_tail(file, widths)
+        writer = csv.writer(BytesWriter(file))
+        writer.writerows(records)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def read(path : str, offset : int = 0, ino : Optional[int] = None,
+         widths : tuple[int,...] = WIDTHS) -> Optional[tuple[list[list[str]],int,Optional[int]]]:
+    """Complete records after offset, with the offset and inode to read from next time.
+    None when the file at path is not the one offset points into (compacted meanwhile)."""
+    try:
+        file = open(path, mode="rb")
+    except FileNotFoundError:
+        return ([], 0, None) if offset == 0 else None
+    with file:
+        stat = os.fstat(file.fileno())
+        if offset and stat.st_ino != ino:
+            return None
+        file.seek(offset)
+        data = file.read()
+    end = data.rfind(b"\n") + 1 # a row without its newline is still being written
+    return records(data[:end], widths), offset + end, stat.st_ino
+
+
+def records(data : bytes, widths : tuple[int,...] = WIDTHS) -> list[list[str]]:
+    rows = csv.reader(io.StringIO(data.decode(), newline=""))
+    return [row for row in rows if len(row) in widths]
+
+
+def repair_tail(file, widths : tuple[int,...]) -> None:
+    # The last row must end with a newline before we append: add it when the row is
+    # complete, cut the row off when it is a torn write (fewer fields than widths[0])
+    size = file.seek(0, os.SEEK_END)
+    if size == 0:
+        return
+    file.seek(max(0, size - 4096))
+    tail = file.read()
+    if tail.endswith(b"\n"):
+        return
+    start = tail.rfind(b"\n") + 1
+    last_row = next(csv.reader([tail[start:].decode()]), [])
+    if len(last_row) == widths[0]:
+        file.write(b"\r\n")
+    else:
+        file.truncate(size - len(tail) + start)
+
+
+class BytesWriter:
+    # csv writers write str, the files are opened in binary mode for the tail repair
+    def __init__(self, file, offset : int = 0):
+        self.file = file
+        self.offset = offset # where the next row starts, for task_index
+
+    def write(self, text : str) -> int:
+        written = self.file.write(text.encode())
+        self.offset += written
+        return written
@@ -0,0 +1,45 @@
+"""
+Work queue behind POST /Tasks/v2/queue/claim: a min-heap of (rank of the priority, id) of the
+Incomplete tasks, so the next tasks to work on are the top of the heap, not a sort of every
+task. Highest priority first, then the oldest (lowest id).
+
+A changed task is pushed again rather than searched for in the heap: entries that no longer
+match their task (claimed, removed, priority changed) are dropped when they reach the top.
+"""
+
+import heapq
+from typing import Callable,Iterable,Optional
+
+PRIORITIES = ("highest", "high", "medium", "low", "lower") # unknown ones come after "lower"
+
+
+def rank(priority : Optional[str]) -> int:
+    try:
+        return PRIORITIES.index(priority)
+    except ValueError:
+        return len(PRIORITIES)
+
+
+class WorkQueue:
+    def __init__(self):
+        self.heap : list[tuple[int,int]] = []
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, id : int, priority : Optional[str]) -> None:
+        heapq.heappush(self.heap, (rank(priority), id))
+
+    def add_many(self, entries : Iterable[tuple[int,Optional[str]]]) -> None:
+        self.heap.extend((rank(priority), id) for id, priority in entries)
+        heapq.heapify(self.heap)
+
+    def pop(self, count : int, current : Callable[[int],Optional[int]]) -> list[int]:
+        """Take the count first ids off the queue. current(id): rank() of the priority of the
+        task if it is still waiting (Incomplete), None if not."""
+        ids : dict[int,None] = {} # a task pushed twice is taken once
+        while self.heap and len(ids) < count:
+            order, id = heapq.heappop(self.heap)
+            if current(id) == order:
+                ids[id] = None
+        return list(ids)
@@ -0,0 +1,218 @@
+"""
+Keyword search for GET /Tasks/sreach. Inverted index: token -> task ids, one per field, so a
+query only touches the tasks holding its terms. Prefix lookups use the sorted vocabulary:
+every token starting with a prefix sits in one contiguous run found by bisection.
+
+    docs                    -> tasks with a token starting with "docs" in any field
+    title:readme ongoing    -> "readme" in the title AND "ongoing..." in any field
+"""
+
+import heapq
+import re
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Callable,Iterable,Iterator,Optional
+from schemas import TaskID
+
+TOKEN = re.compile(r"\w+")
+FIELD_TERM = re.compile(r"(\w+):(.+)")
+
+
+def tokenize(text : str) -> list[str]:
+    return TOKEN.findall(text.lower())
+
+
+class Vocabulary:
+    """Sorted tokens, in blocks of at most 2 * BLOCK: a new token shifts one block, not every
+    token after it."""
+    BLOCK = 1000
+
+    def __init__(self):
+        self.blocks : list[list[str]] = []
+        self.lasts : list[str] = [] # last token of each block
+
+    def __len__(self) -> int:
+        return sum(len(block) for block in self.blocks)
+
+    def __iter__(self) -> Iterator[str]:
+        for block in self.blocks:
+            yield from block
+
+    def add(self, token : str) -> None:
+        if not self.blocks:
+            self.blocks.append([token])
+            self.lasts.append(token)
+            return
+        position = min(bisect_left(self.lasts, token), len(self.blocks) - 1)
+        block = self.blocks[position]
+        insort(block, token)
+        self.lasts[position] = block[-1]
+        if len(block) > 2 * Vocabulary.BLOCK:
+            half = len(block) // 2
+            self.blocks[position:position + 1] = [block[:half], block[half:]]
+            self.lasts.insert(position, block[half - 1])
+
+    def add_many(self, tokens : set[str]) -> None:
+        # many new tokens next to the vocabulary: sorted once with it instead of inserted one by one
+        if len(tokens) < len(self) // 8:
+            for token in tokens:
+                self.add(token)
+            return
+        merged = sorted([*self, *tokens])
+        self.blocks = [merged[start:start + Vocabulary.BLOCK] for start in range(0, len(merged), Vocabulary.BLOCK)]
+        self.lasts = [block[-1] for block in self.blocks]
+
+    def remove(self, token : str) -> None:
+        position = bisect_left(self.lasts, token)
+        block = self.blocks[position]
+        del block[bisect_left(block, token)]
+        if not block:
+            del self.blocks[position]
+            del self.lasts[position]
+        else:
+            self.lasts[position] = block[-1]
+
+    def starting_at(self, first : str) -> Iterator[str]:
+        """The tokens from first on, in order."""
+        position = bisect_left(self.lasts, first)
+        if position < len(self.blocks):
+            yield from islice(self.blocks[position], bisect_left(self.blocks[position], first), None)
+        for block in self.blocks[position + 1:]:
+            yield from block
+
+
+class TaskSearchIndex:
+    FIELDS = {"title": 3, "description": 1, "status": 1} # field -> weight in the ranking
+    MAX_EXPANSIONS = 64 # tokens a lone prefix may expand to, keeps one letter queries bounded
+
+    def __init__(self):
+        self.postings : dict[str,dict[str,set[str]]] = {field: {} for field in TaskSearchIndex.FIELDS}
+        self.vocabulary = Vocabulary() # every token of every field once
+
+    def add(self, task : TaskID) -> None:
+        for field in TaskSearchIndex.FIELDS:
+            for token in set(tokenize(getattr(task, field))):
+                ids = self.postings[field].get(token)
+                if ids is None:
+                    ids = self.postings[field][token] = set()
+                    if not self._known(token, skip=field):
+                        self.vocabulary.add(token)
+                ids.add(task.id)
+
+    def add_many(self, tasks : Iterable[TaskID]) -> None:
+        # Initial build: the vocabulary is sorted once at the end instead of one insort per new token
+        for task in tasks:
+            for field, postings in self.postings.items():
+                for token in set(tokenize(getattr(task, field))):
+                    ids = postings.get(token)
+                    if ids is None:
+                        ids = postings[token] = set()
+                    ids.add(task.id)
+        self.vocabulary = Vocabulary()
+        self.vocabulary.add_many(set().union(*self.postings.values()))
+
+    def remove(self, task : TaskID) -> None:
+        for field in TaskSearchIndex.FIELDS:
+            for token in set(tokenize(getattr(task, field))):
+                ids = self.postings[field].get(token)
+                if ids is None:
+                    continue
+                ids.discard(task.id)
+                if not ids:
+                    del self.postings[field][token]
+                    if not self._known(token):
+                        self.vocabulary.remove(token)
+
+    def _known(self, token : str, skip : str = "") -> bool:
+        return any(token in postings for field, postings in self.postings.items() if field != skip)
+
+    def _completions(self, prefix : str) -> Iterator[str]:
+        # every token starting with prefix, in order
+        for token in self.vocabulary.starting_at(prefix):
+            if not token.startswith(prefix):
+                return
+            yield token
+
+    @staticmethod
+    def parse(query : str) -> list[tuple[Optional[str],str]]:
+        """(field or None for any field, term) for every term of the query."""
+        terms = []
+        for word in query.split():
+            match = FIELD_TERM.fullmatch(word)
+            if match and match[1].lower() in TaskSearchIndex.FIELDS:
+                terms += [(match[1].lower(), term) for term in tokenize(match[2])]
+            else:
+                terms += [(None, term) for term in tokenize(word)]
+        return terms
+
+    def _postings(self, field : Optional[str], tokens : list[str]) -> list[tuple[int,set[str]]]:
+        fields = [field] if field else TaskSearchIndex.FIELDS
+        return [(TaskSearchIndex.FIELDS[name], ids) for name in fields
+                for token in tokens if (ids := self.postings[name].get(token))]
+
+    def search(self, query : str, offset : int = 0, limit : int = 50, prefix : bool = True,
+               task : Optional[Callable[[str],TaskID]] = None) -> list[str]:
+        """Ids of the tasks matching every term, best first. With prefix the last term
+        may be the start of a word. task(id): the task, to test a prefix on a few candidates
+        rather than on its many completions."""
+        terms = self.parse(query)
+        if not terms:
+            return []
+        if not prefix:
+            scores = self._match([self._postings(field, [term]) for field, term in terms])
+        elif len(terms) > 1:
+            # The other terms find the candidates, then every completion of the prefix is
+            # tested against them only: none is dropped, however common the prefix
+            scores = self._match([self._postings(field, [term]) for field, term in terms[:-1]])
+            scores = self._match_prefix(scores, *terms[-1], task)
+        else: # a lone prefix: the tasks of its first MAX_EXPANSIONS completions (a list, read once per field)
+            field, last = terms[0]
+            scores = self._match([self._postings(field, list(islice(self._completions(last), TaskSearchIndex.MAX_EXPANSIONS)))])
+        # same score: by id, as numbers ("9" before "10")
+        best = heapq.nsmallest(offset + limit, scores, key=lambda id: (-scores[id], len(id), id))
+        return best[offset:]
+
+    @staticmethod
+    def _match(per_term : list[list[tuple[int,set[str]]]]) -> dict[str,int]:
+        """Score of the tasks matching every term (the postings of each), best field weight per term."""
+        # AND: only the rarest term is walked, the others are membership tests
+        per_term.sort(key=lambda postings: sum(len(ids) for _, ids in postings))
+        scores : dict[str,int] = {}
+        for weight, ids in per_term[0]:
+            for id in ids:
+                if scores.get(id, 0) < weight:
+                    scores[id] = weight
+        for postings in per_term[1:]:
+            for id in list(scores):
+                weight = max((weight for weight, ids in postings if id in ids), default=0)
+                if weight:
+                    scores[id] += weight
+                else:
+                    del scores[id]
+        return scores
+
+    def _match_prefix(self, scores : dict[str,int], field : Optional[str], prefix : str,
+                      task : Optional[Callable[[str],TaskID]]) -> dict[str,int]:
+        # scores of the candidates holding a token that starts with prefix (in field, or any
+        # field), its weight added
+        fields = {field: TaskSearchIndex.FIELDS[field]} if field else TaskSearchIndex.FIELDS
+        weights : dict[str,int] = {}
+        if not scores:
+            return weights
+        if task is not None and len(scores) <= sum(1 for _ in islice(self._completions(prefix), len(scores))):
+            # fewer candidates than completions (short prefix): look for a word starting with
+            # prefix in the text of each candidate
+            starts_word = re.compile(r"(?<!\w)" + re.escape(prefix))
+            for id in scores:
+                found = task(id)
+                weights[id] = max((weight for name, weight in fields.items()
+                                   if starts_word.search(getattr(found, name).lower())), default=0)
+            return {id: scores[id] + weight for id, weight in weights.items() if weight}
+        for token in self._completions(prefix):
+            for name, weight in fields.items():
+                ids = self.postings[name].get(token)
+                if ids:
+                    for id in scores.keys() & ids: # walks the smaller of the two
+                        if weights.get(id, 0) < weight:
+                            weights[id] = weight
+        return {id: scores[id] + weight for id, weight in weights.items()}
@@ -0,0 +1,77 @@
+"""
+CSV (rewrite and log write modes) vs SQLite backend, per storage call, as the task table grows.
+
+    python benchmarks/bench_backends.py --sizes 10000 100000 1000000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+from opr_sqlite import OpsSQLite
+from schemas import Task, TaskID
+
+
+def tasks(count):
+    for id in range(1, count + 1):
+        yield TaskID.model_construct(id=str(id), title=f"Task {id}", description=f"Description {id}",
+                                     status="Ongoing" if id % 2 else "Incomplete")
+
+
+def open_backend(backend, directory, count):
+    if backend == "sqlite":
+        storage = OpsSQLite(os.path.join(directory, "tasks.db"))
+        storage.import_tasks(tasks(count))
+        return storage
+    OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+    OpsCSV.APPEND_LOG = backend == "csv-log"
+    with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+        writer.writeheader()
+        writer.writerows(task.model_dump() for task in tasks(count))
+    return OpsCSV()
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for n in range(repeat):
+        func(n)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", default=["csv", "csv-log", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    operations = ["first all()", "all()", "get by id", "by status", "by title", "create", "modify", "remove"]
+    print(f"{'tasks':>8} {'backend':>8} " + " ".join(f"{name:>11}" for name in operations) + "   (ms/call)")
+    for size in args.sizes:
+        for backend in args.backends:
+            with tempfile.TemporaryDirectory() as directory:
+                storage = open_backend(backend, directory, size)
+                middle = size // 2
+                results = [
+                    timed(lambda n: storage.all(), 1), # cold: the CSV is parsed here
+                    timed(lambda n: storage.all(), args.repeat),
+                    timed(lambda n: storage.get_task_by_id(str(middle + n)), args.repeat * 20),
+                    timed(lambda n: storage.get_by_status("Ongoing"), args.repeat),
+                    timed(lambda n: storage.get_by_title(f"Task {middle + n}"), args.repeat * 20),
+                    timed(lambda n: storage.create_task(Task(title="New", description="New", status="Ongoing")),
+                          args.repeat),
+                    timed(lambda n: storage.modify_task(str(middle + n), {"title": None, "description": "edited",
+                                                                          "status": "Incomplete"}), args.repeat),
+                    timed(lambda n: storage.remove_task(str(1 + n)), args.repeat),
+                ]
+                print(f"{size:>8} {backend:>8} " + " ".join(f"{result:>11.3f}" for result in results))
+
+
+if __name__ == "__main__":
+    main()
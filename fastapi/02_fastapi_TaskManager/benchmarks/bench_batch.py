@@ -0,0 +1,70 @@
+"""
+A bulk job of creates, updates and deletes: one storage call per task vs one apply_batch,
+per write mode and table size.
+
+    python benchmarks/bench_batch.py --sizes 1000 10000 --items 200
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+from schemas import Task
+
+
+def fill(size):
+    with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+        writer.writeheader()
+        for id in range(1, size + 1):
+            writer.writerow({"id": id, "title": f"Task {id}", "description": f"Description {id}",
+                             "status": "Ongoing" if id % 2 else "Incomplete"})
+
+
+def one_by_one(opr, creates, updates, deletes):
+    for task in creates:
+        opr.create_task(task)
+    for id, task in updates:
+        opr.modify_task(id, task)
+    for id in deletes:
+        opr.remove_task(id)
+
+
+def batched(opr, creates, updates, deletes):
+    opr.apply_batch(creates, updates, deletes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--items", type=int, default=200, help="items per kind (creates, updates, deletes)")
+    args = parser.parse_args()
+
+    for mode in ("rewrite", "log"):
+        OpsCSV.APPEND_LOG = mode == "log"
+        for size in args.sizes:
+            line = f"{mode:<8} {size:>8} tasks"
+            for label, func in (("one by one", one_by_one), ("batch", batched)):
+                with tempfile.TemporaryDirectory() as directory:
+                    OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+                    fill(size)
+                    opr = OpsCSV()
+                    opr.all() # warm cache
+                    items = min(args.items, size // 2)
+                    creates = [Task(title=f"New {n}", description="bulk", status="Ongoing") for n in range(items)]
+                    updates = [(str(id), {"title": None, "description": "bulk edit", "status": None})
+                               for id in range(1, items + 1)]
+                    deletes = [str(id) for id in range(items + 1, 2 * items + 1)]
+                    start = time.perf_counter()
+                    func(opr, creates, updates, deletes)
+                    line += f"   {label} {time.perf_counter() - start:8.3f} s"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Read endpoints' storage calls with the mtime cache vs parsing task.csv on every call.
+
+    python benchmarks/bench_cache.py --tasks 100000
+"""
+import argparse
+import contextlib
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+from schemas import Task, TaskID
+
+
+def parse_every_time():
+    # the read path before the cache: open and parse the whole file on each call
+    with open(OpsCSV.DATABASE_NAME) as file:
+        return [TaskID(**row) for row in csv.DictReader(file)]
+
+
+def timed(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<40} {elapsed * 1e3:10.3f} ms/call")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+        with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+            writer.writeheader()
+            for id in range(1, args.tasks + 1):
+                writer.writerow({"id": id, "title": f"Task {id}", "description": f"Description {id}",
+                                 "status": "Ongoing" if id % 2 else "Incomplete"})
+
+        opr = OpsCSV()
+        middle = str(args.tasks // 2)
+        timed("all(), parse every time", parse_every_time, args.repeat)
+        timed("get_task_by_id, parse every time",
+              lambda: next(task for task in parse_every_time() if task.id == middle), args.repeat)
+        timed("first call, cold cache", opr.all, 1)
+        timed("all(), cached", opr.all, args.repeat * 20)
+        timed("get_task_by_id, cached", lambda: opr.get_task_by_id(middle), args.repeat * 20)
+        # a worker whose cache is cold or stale reads the row through task.csv.idx
+        def rebuild():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(OpsCSV.DATABASE_NAME + ".idx")
+            return OpsCSV().get_task_by_id(middle)
+        timed("get_task_by_id, cold, index rebuilt", rebuild, args.repeat)
+        timed("get_task_by_id, cold, index on disk", lambda: OpsCSV().get_task_by_id(middle), args.repeat * 20)
+        timed("create_task + all()", lambda: (opr.create_task(Task(title="New", description="New", status="Ongoing")),
+                                             opr.all()), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+A client keeping its copy in sync after a few writes: GET /Tasks/ in full (before) vs
+GET /Tasks/changes?since=N, response bytes and time. Then what the journal adds to a write.
+
+    python benchmarks/bench_changes.py --tasks 100000 --writes 50
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from fastapi.testclient import TestClient
+import routers
+from main import app
+from opr_csv import OpsCSV
+from storage import AsyncStorage
+
+
+def timed(label, client, url, params, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, params=params)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<28} {elapsed * 1e3:9.2f} ms  {len(response.content):>12,} bytes")
+
+
+def write_latency(opr, writes):
+    start = time.perf_counter()
+    for n in range(writes):
+        opr.modify_task(str(n % 1000 + 1), {"title": None, "description": f"edit {n}", "status": None})
+    return (time.perf_counter() - start) / writes * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--writes", type=int, default=50, help="writes between two syncs")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mode", choices=["rewrite", "log"], default="log")
+    args = parser.parse_args()
+
+    OpsCSV.APPEND_LOG = args.mode == "log"
+    with tempfile.TemporaryDirectory() as directory:
+        OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+        with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+            writer.writeheader()
+            for id in range(1, args.tasks + 1):
+                writer.writerow({"id": id, "title": f"Task {id}", "description": f"Description {id}",
+                                 "status": "Ongoing" if id % 2 else "Incomplete"})
+        opr = OpsCSV()
+        routers.opr = AsyncStorage(opr)
+        client = TestClient(app)
+        seq = client.get("/Tasks/changes").json()["seq"] # first sync: every task
+        after = write_latency(opr, args.writes)
+        timed("GET /Tasks/ (full)", client, "/Tasks/", {}, args.repeat)
+        timed(f"changes ({args.writes} writes)", client, "/Tasks/changes", {"since": seq}, args.repeat)
+
+        journal = opr._journal
+        opr._journal = lambda *ids: None
+        before = write_latency(opr, args.writes)
+        opr._journal = journal
+        print(f"{args.mode} write: {before:.2f} ms without the journal, {after:.2f} ms with it")
+
+
+if __name__ == "__main__":
+    main()
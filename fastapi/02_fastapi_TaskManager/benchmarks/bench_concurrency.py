@@ -0,0 +1,93 @@
+"""
+Tail latency of the async routes under concurrent mixed reads/writes, storage calls run on
+the event loop (--threads 0, as before AsyncStorage) vs on the thread pool.
+
+    python benchmarks/bench_concurrency.py --tasks 20000 --rate 200 --threads 0 8
+"""
+import argparse
+import asyncio
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+import httpx
+import routers
+from main import app
+from opr_csv import OpsCSV
+from storage import AsyncStorage
+
+
+def percentile(timings, share):
+    return timings[min(int(len(timings) * share), len(timings) - 1)] * 1e3
+
+
+async def request(http, rng, scheduled, timings, max_id):
+    await asyncio.sleep(scheduled - time.perf_counter())
+    draw = rng.random()
+    if draw < 0.8:
+        op = "read"
+        response = await http.get(f"/Tasks/{rng.randint(1, max_id)}")
+    elif draw < 0.9:
+        op = "create"
+        response = await http.post("/Tasks/", json={"title": "New", "description": "bench", "status": "Ongoing"})
+    else:
+        op = "update"
+        response = await http.put(f"/Tasks/{rng.randint(1, max_id)}",
+                                  json={"title": None, "description": "edited", "status": None})
+    # from the time the request was due, not sent: a blocked loop delays the sending too
+    timings[op].append(time.perf_counter() - scheduled)
+    assert response.status_code in (200, 404), response.text
+
+
+async def run(threads, args):
+    routers.opr = AsyncStorage(OpsCSV(), threads)
+    await routers.opr.all() # warm cache, the cold parse is bench_cache.py's subject
+    timings = {"read": [], "create": [], "update": []}
+    rng = random.Random(42)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        # open loop: requests arrive at --rate whatever the server does, as clients would
+        start = scheduled = time.perf_counter()
+        requests = []
+        for _ in range(args.requests):
+            scheduled += rng.expovariate(args.rate)
+            requests.append(request(http, random.Random(rng.random()), scheduled, timings, args.tasks))
+        await asyncio.gather(*requests)
+        elapsed = time.perf_counter() - start
+    label = f"threads={threads}" if threads else "event loop"
+    print(f"{label}: {args.requests / elapsed:7.0f} req/s")
+    for op, values in timings.items():
+        values.sort()
+        print(f"  {op:<7} p50 {percentile(values, 0.5):8.2f} ms  p99 {percentile(values, 0.99):8.2f} ms"
+              f"  max {values[-1] * 1e3:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=20_000)
+    parser.add_argument("--rate", type=float, default=200, help="requests per second")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0, 8])
+    parser.add_argument("--mode", choices=["rewrite", "log"], default="log")
+    args = parser.parse_args()
+
+    OpsCSV.APPEND_LOG = args.mode == "log"
+    for threads in args.threads:
+        with tempfile.TemporaryDirectory() as directory:
+            OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+            with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+                writer.writeheader()
+                for id in range(1, args.tasks + 1):
+                    writer.writerow({"id": id, "title": f"Task {id}", "description": f"Description {id}",
+                                     "status": "Ongoing" if id % 2 else "Incomplete"})
+            asyncio.run(run(threads, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Filtered GET /Tasks/ reads: a scan of every cached task (before) vs the status/title indexes,
+and the counts per status.
+
+    python benchmarks/bench_facets.py --tasks 200000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+
+STATUSES = ["Ongoing", "Incomplete", "Blocked", "Done"]
+
+
+def timed(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<40} {elapsed * 1e3:9.3f} ms   {len(result):>7} results")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+        with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+            writer.writeheader()
+            for id in range(1, args.tasks + 1):
+                # a few common titles, many rare ones; statuses skewed towards the first
+                title = f"Chore {rng.randint(1, 20)}" if id % 10 else f"Task {id}"
+                writer.writerow({"id": id, "title": title, "description": f"Description {id}",
+                                 "status": rng.choices(STATUSES, weights=[60, 30, 9, 1])[0]})
+        opr = OpsCSV()
+        tasks = opr.all()
+
+        def scan(status=None, title=None):
+            # get_all before the indexes: every task tested
+            return [task for task in tasks if (status is None or task.status == status)
+                    and (title is None or task.title == title)]
+
+        start = time.perf_counter()
+        opr.facets("status")
+        print(f"indexes built in {(time.perf_counter() - start) * 1e3:.0f} ms (first filtered call)")
+        cases = [
+            ("status=Done (1%)", {"status": "Done"}),
+            ("status=Ongoing (60%)", {"status": "Ongoing"}),
+            ("title=Task 10 (1 task)", {"title": "Task 10"}),
+            ("status=Blocked&title=Chore 3", {"status": "Blocked", "title": "Chore 3"}),
+        ]
+        for label, filters in cases:
+            timed(f"scan    {label}", lambda: scan(**filters), args.repeat)
+            timed(f"index   {label}", lambda: opr.filter(**filters), args.repeat)
+        timed("scan    counts per status", lambda: {status: len(scan(status=status)) for status in STATUSES}, args.repeat)
+        timed("index   facets(status)", lambda: opr.facets("status"), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Update and delete latency as task.csv grows: "rewrite" mode (whole file rewritten on every
+write) vs "log" mode (one appended record, compaction in the background).
+
+    python benchmarks/bench_log.py --sizes 1000 10000 100000
+"""
+import argparse
+import csv
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+
+
+def write_tasks(path, count):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+        writer.writeheader()
+        for id in range(1, count + 1):
+            writer.writerow({"id": id, "title": f"Task {id}", "description": f"Description {id}",
+                             "status": "Ongoing" if id % 2 else "Incomplete"})
+
+
+def timed(func, ids):
+    latencies = []
+    for id in ids:
+        start = time.perf_counter()
+        func(id)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies) * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--writes", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'tasks':>8} {'mode':>8} {'update p50':>11} {'p99':>9} {'delete p50':>11} {'p99':>9}")
+    for size in args.sizes:
+        for mode in ("rewrite", "log"):
+            with tempfile.TemporaryDirectory() as directory:
+                OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+                OpsCSV.APPEND_LOG = mode == "log"
+                write_tasks(OpsCSV.DATABASE_NAME, size)
+                opr = OpsCSV()
+                opr.all() # parse once, not part of the timings
+                writes = min(args.writes, size // 2)
+                update = timed(lambda id: opr.modify_task(str(id), {"title": None, "description": "edited",
+                                                                    "status": "Incomplete"}), range(1, writes + 1))
+                delete = timed(opr.remove_task, [str(id) for id in range(writes + 1, 2 * writes + 1)])
+                print(f"{size:>8} {mode:>8} {update[0]:>8.3f} ms {update[1]:>6.3f} ms "
+                      f"{delete[0]:>8.3f} ms {delete[1]:>6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+"The next N tasks to work on": every v2 task fetched, filtered and sorted (before, client side)
+vs claim(N) off the priority heap. Then several processes claim until the queue is empty, and
+no task may be handed out twice.
+
+    python benchmarks/bench_queue.py --tasks 100000 --count 10 --workers 4
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+from task_queue import PRIORITIES, rank
+
+
+def fill(tasks):
+    priorities = random.Random(tasks)
+    with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+        writer.writeheader()
+        for id in range(1, tasks + 1):
+            writer.writerow({"id": id, "title": f"Task {id}", "description": f"Description {id}",
+                             "status": "Incomplete" if id % 4 else "Ongoing",
+                             "priority": priorities.choice(PRIORITIES)})
+
+
+def worker(path, mode, count, results):
+    OpsCSV.DATABASE_NAME, OpsCSV.APPEND_LOG = path, mode == "log"
+    opr = OpsCSV()
+    claimed = []
+    while tasks := opr.claim(count):
+        claimed.extend(task.id for task in tasks)
+    results.put(claimed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--count", type=int, default=10, help="tasks per claim")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", choices=["rewrite", "log"], default="log")
+    args = parser.parse_args()
+
+    OpsCSV.APPEND_LOG = args.mode == "log"
+    with tempfile.TemporaryDirectory() as directory:
+        OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+        fill(args.tasks)
+        opr = OpsCSV()
+        opr.read_all_tasks_v2() # warm cache
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            waiting = [task for task in opr.read_all_tasks_v2() if task.status == "Incomplete"]
+            waiting.sort(key=lambda task: (rank(task.priority), task.id))
+            waiting[:args.count]
+        print(f"scan + sort of /Tasks/v2/tasks {(time.perf_counter() - start) / args.repeat * 1e3:9.3f} ms")
+        first = opr.claim(args.count) # builds the heap
+        assert [task.id for task in first] == [task.id for task in waiting[:args.count]], "not claimed in priority order"
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            opr.claim(args.count)
+        print(f"claim({args.count}), {args.mode:<7}          {(time.perf_counter() - start) / args.repeat * 1e3:9.3f} ms"
+              " (marks them Ongoing, a write)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+        fill(args.tasks // 10)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(OpsCSV.DATABASE_NAME, args.mode, args.count, results))
+                     for _ in range(args.workers)]
+        for process in processes:
+            process.start()
+        claimed = [id for _ in processes for id in results.get()]
+        for process in processes:
+            process.join()
+        expected = sum(1 for id in range(1, args.tasks // 10 + 1) if id % 4)
+        assert len(claimed) == len(set(claimed)), "a task was claimed twice"
+        assert len(claimed) == expected, f"{len(claimed)} tasks claimed, {expected} were waiting"
+        print(f"{args.workers} processes claimed {len(claimed)} tasks, each once")
+
+
+if __name__ == "__main__":
+    main()
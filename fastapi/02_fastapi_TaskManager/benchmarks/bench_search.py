@@ -0,0 +1,75 @@
+"""
+/Tasks/sreach latency: the inverted index vs the old substring test over every task.
+
+    python benchmarks/bench_search.py --tasks 1000000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from schemas import TaskID
+from task_search import TaskSearchIndex
+
+
+def words(count, rng):
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(count)]
+
+
+def substring_scan(tasks, keyword):
+    # the search before the index
+    return [task for task in tasks if keyword in (task.status + task.description + task.title)]
+
+
+def percentiles(func, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e3, timings[int(len(timings) * 0.99)] * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--scans", type=int, default=5, help="queries for the (slow) substring scan")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    title_words, description_words = words(20_000, rng), words(50_000, rng)
+    tasks = [TaskID.model_construct(id=str(id), title=" ".join(rng.choices(title_words, k=rng.randint(1, 4))),
+                                    description=" ".join(rng.choices(description_words, k=rng.randint(3, 12))),
+                                    status=rng.choice(["Ongoing", "Incomplete"]))
+             for id in range(1, args.tasks + 1)]
+    by_id = {task.id: task for task in tasks} # as OpsCSV.search
+    index = TaskSearchIndex()
+    start = time.perf_counter()
+    index.add_many(tasks)
+    print(f"index {args.tasks} tasks: {time.perf_counter() - start:.1f} s, {len(index.vocabulary)} tokens")
+
+    p50, p99 = percentiles(lambda query: substring_scan(tasks, query), rng.choices(title_words, k=args.scans))
+    print(f"{'substring scan':<22} p50 {p50:9.3f} ms   p99 {p99:9.3f} ms")
+    queries = {
+        "one word": [rng.choice(title_words) for _ in range(args.queries)],
+        "two words (AND)": [f"{rng.choice(title_words)} {rng.choice(description_words)}" for _ in range(args.queries)],
+        "title:word": [f"title:{rng.choice(title_words)}" for _ in range(args.queries)],
+        "prefix (3 chars)": [rng.choice(title_words)[:3] for _ in range(args.queries)],
+        "word + status": [f"{rng.choice(title_words)} status:ongoing" for _ in range(args.queries)],
+        "word + 1 char": [f"{rng.choice(title_words)} {rng.choice(string.ascii_lowercase)}" for _ in range(args.queries)],
+        "page 3 of one word": [rng.choice(title_words) for _ in range(args.queries)],
+    }
+    for label, batch in queries.items():
+        offset = 100 if label.startswith("page") else 0
+        p50, p99 = percentiles(lambda query: index.search(query, offset=offset, limit=50, task=by_id.get), batch)
+        print(f"{label:<22} p50 {p50:9.3f} ms   p99 {p99:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
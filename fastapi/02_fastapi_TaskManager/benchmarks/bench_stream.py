@@ -0,0 +1,62 @@
+"""
+Peak memory and time of GET /Tasks/ as one JSON list vs streamed as NDJSON/CSV, on a cold worker.
+
+    python benchmarks/bench_stream.py --sizes 10000 100000 1000000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from pydantic import TypeAdapter
+from opr_csv import OpsCSV
+from routers import encode
+from schemas import TaskID
+
+
+def as_list():
+    # what get_all does without format: every task parsed, then one JSON document
+    return len(TypeAdapter(list[TaskID]).dump_json(OpsCSV().all()))
+
+
+def streamed(format):
+    return sum(len(chunk) for chunk in encode(OpsCSV().stream(), format, OpsCSV.FIELDS))
+
+
+def measure(label, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} {elapsed:8.2f} s  peak {peak / 2**20:9.1f} MiB  body {size / 2**20:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+            with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+                writer.writeheader()
+                for id in range(1, size + 1):
+                    writer.writerow({"id": id, "title": f"Task {id}", "description": f"Description {id}",
+                                     "status": "Ongoing" if id % 2 else "Incomplete"})
+            print(f"{size} tasks")
+            measure("json list", as_list)
+            measure("ndjson", lambda: streamed("ndjson"))
+            measure("csv", lambda: streamed("csv"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Rows per second turned into models: one TaskID(**row) per row (before), model_construct (no
+validation, but a Python loop over the fields) and one TypeAdapter call for the list. The same
+for the v2 models built from the TaskIDs. Then a cold OpsCSV().all() and read_all_tasks_v2().
+
+    python benchmarks/bench_validation.py --rows 200000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+from schemas import TASK_LIST, TASK_V2_LIST, TaskID, TaskV2WithID
+
+
+def rate(label, rows, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed * 1e3:8.0f} ms  {rows / elapsed:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rows = [{"id": str(id), "title": f"Task {id}", "description": f"Description {id}",
+             "status": "Ongoing" if id % 2 else "Incomplete"} for id in range(1, args.rows + 1)]
+    rate("TaskID(**row)", args.rows, lambda: [TaskID(**row) for row in rows])
+    rate("TaskID.model_construct(**row)", args.rows, lambda: [TaskID.model_construct(**row) for row in rows])
+    rate("TASK_LIST.validate_python(rows)", args.rows, lambda: TASK_LIST.validate_python(rows))
+    tasks = TASK_LIST.validate_python(rows)
+    rate("v2: TaskV2WithID(**model_dump())", args.rows, lambda: [TaskV2WithID(**task.model_dump()) for task in tasks])
+    rate("v2: model_construct", args.rows, lambda: [TaskV2WithID.model_construct(**task.__dict__ | {"id": int(task.id)})
+                                                    for task in tasks])
+    rate("v2: TASK_V2_LIST.validate_python", args.rows, lambda: TASK_V2_LIST.validate_python([task.__dict__ for task in tasks]))
+
+    with tempfile.TemporaryDirectory() as directory:
+        OpsCSV.DATABASE_NAME = os.path.join(directory, "task.csv")
+        with open(OpsCSV.DATABASE_NAME, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=OpsCSV.FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        rate("cold all()", args.rows, lambda: OpsCSV().all())
+        rate("cold read_all_tasks_v2()", args.rows, lambda: OpsCSV().read_all_tasks_v2())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Several processes create, modify and remove tasks on one task.csv at the same time,
+then the file is checked: it parses, every row is complete, no id was given twice and every
+create/remove that succeeded shows in it, also through the id index.
+
+    python benchmarks/stress_processes.py --workers 8 --operations 300
+    python benchmarks/stress_processes.py --mode log    # appends + background compaction
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+from schemas import Task
+
+
+def worker(path, mode, seed, operations, results):
+    OpsCSV.DATABASE_NAME = path
+    OpsCSV.APPEND_LOG = mode == "log"
+    OpsCSV.COMPACT_MIN_RECORDS = 200 # compact many times during the run
+    opr = OpsCSV()
+    rng = random.Random(seed)
+    # a worker only touches its own tasks
+    live, created, removed = {}, [], []
+    for n in range(operations):
+        action = rng.random()
+        if action < 0.6 or not live:
+            task = opr.create_task(Task(title=f"w{seed}-{n}", description="stress", status="Ongoing"))["Created Tasks"]
+            live[task.id] = task.title
+            created.append((task.id, task.title))
+        elif action < 0.85:
+            opr.modify_task(rng.choice(list(live)), {"title": None, "description": f"edit {n}", "status": "Incomplete"})
+        else:
+            id = rng.choice(list(live))
+            task = opr.remove_task(id)
+            assert task is not None and task.title == live[id], f"{id} is not the task this worker created"
+            removed.append((id, live.pop(id)))
+    results.put((created, removed))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=300)
+    parser.add_argument("--mode", choices=["rewrite", "log"], default="rewrite")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "task.csv")
+        with open(path, "w", newline="") as file:
+            csv.DictWriter(file, fieldnames=OpsCSV.FIELDS).writeheader()
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(path, args.mode, seed, args.operations, results))
+                     for seed in range(args.workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        outcomes = []
+        while len(outcomes) < len(processes):
+            try:
+                outcomes.append(results.get(timeout=1))
+            except queue.Empty:
+                failed = [process for process in processes if process.exitcode not in (None, 0)]
+                if failed:
+                    sys.exit(f"{len(failed)} worker(s) failed, see the traceback above")
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        if args.mode == "log":
+            OpsCSV.DATABASE_NAME, OpsCSV.APPEND_LOG = path, True
+            OpsCSV().compact() # fold what is left of the log, then check task.csv alone
+            assert not os.path.exists(path + ".log.old"), "compaction left task.csv.log.old"
+        with open(path, newline="") as file:
+            rows = list(csv.reader(file))
+        header, rows = rows[0], rows[1:]
+        assert header == OpsCSV.FIELDS, header
+        torn = [row for row in rows if len(row) != len(OpsCSV.FIELDS)]
+        assert not torn, f"incomplete rows: {torn[:3]}"
+        ids = [row[0] for row in rows]
+        given = [id for created, _ in outcomes for id, _ in created]
+        assert len(given) == len(set(given)), "an id was given twice (removed tasks included)"
+        created = {task for created, _ in outcomes for task in created}
+        removed = {task for _, removed in outcomes for task in removed}
+        assert sorted(zip(ids, (row[1] for row in rows))) == sorted(created - removed), "created tasks lost or removed tasks back"
+        OpsCSV.DATABASE_NAME = path
+        cold = OpsCSV() # never parsed the file: reads go through task.csv.idx
+        assert all(cold.get_task_by_id(row[0]).title == row[1] for row in rows), "task.csv.idx points to the wrong rows"
+
+        total = args.workers * args.operations
+        print(f"{total} operations from {args.workers} processes in {elapsed:.2f} s "
+              f"({total / elapsed:.0f} ops/s), {len(ids)} tasks left, file consistent")
+
+
+if __name__ == "__main__":
+    main()
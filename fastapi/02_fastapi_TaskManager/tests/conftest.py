@@ -0,0 +1,34 @@
+import csv
+import os
+import sys
+
+import pytest
+
+# The app modules import each other by name, as when main.py runs from its directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "02_fastapi_taskmanager"))
+
+from opr_csv import OpsCSV
+
+
+def open_csv(directory, monkeypatch, mode : str) -> OpsCSV:
+    path = directory / "task.csv"
+    with open(path, "w", newline="") as file:
+        csv.writer(file).writerow(OpsCSV.FIELDS)
+    monkeypatch.setattr(OpsCSV, "DATABASE_NAME", str(path))
+    monkeypatch.setattr(OpsCSV, "APPEND_LOG", mode == "log")
+    return OpsCSV()
+
+
+@pytest.fixture(params=["rewrite", "log"])
+def store(request, tmp_path, monkeypatch):
+    """An OpsCSV on an empty task.csv in tmp_path, in both write modes."""
+    return open_csv(tmp_path, monkeypatch, request.param)
+
+
+@pytest.fixture(params=["rewrite", "log", "sqlite"])
+def backend(request, tmp_path, monkeypatch):
+    """Every storage of TASKS_BACKEND, empty: they must behave the same."""
+    if request.param == "sqlite":
+        from opr_sqlite import OpsSQLite
+        return OpsSQLite(str(tmp_path / "tasks.db"))
+    return open_csv(tmp_path, monkeypatch, request.param)
@@ -0,0 +1,55 @@
+import csv
+import sqlite3
+
+from opr_csv import OpsCSV
+from opr_sqlite import OpsSQLite
+from schemas import Task
+
+
+def new_task(title):
+    return Task(title=title, description="Description", status="Incomplete")
+
+
+def ids(changes):
+    return [task.id for task in changes["upserts"]]
+
+
+def test_changes_since_a_seq(backend):
+    for n in range(1, 4):
+        backend.create_task(new_task(f"Task {n}"))
+    seq = backend.changes(0)["seq"]
+    backend.modify_task("1", {"status": "Ongoing"})
+    backend.remove_task("2")
+
+    changes = backend.changes(seq)
+
+    assert (changes["reset"], ids(changes), changes["deletes"]) == (False, ["1"], ["2"])
+    assert backend.changes(changes["seq"])["upserts"] == []
+    assert backend.changes(None)["reset"]
+    assert backend.changes(changes["seq"] + 1)["reset"] # never given out
+
+
+def test_tasks_older_than_the_csv_journal_are_sent(store, tmp_path):
+    with open(tmp_path / "task.csv", "a", newline="") as file: # written before task.csv.changes
+        csv.writer(file).writerows([["1", "Task One", "Description", "Incomplete", "lower"],
+                                    ["2", "Task Two", "Description", "Ongoing", "lower"]])
+    opr = OpsCSV()
+
+    assert ids(opr.changes(0)) == ["1", "2"]
+    opr.create_task(new_task("Task 3"))
+    assert ids(opr.changes(0)) == ["1", "2", "3"]
+    assert ids(OpsCSV().changes(2)) == ["3"]
+
+
+def test_tasks_older_than_the_sqlite_journal_are_sent(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    with sqlite3.connect(path) as conn: # a database from before task_changes
+        conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY, title TEXT NOT NULL, "
+                     "description TEXT NOT NULL, status TEXT NOT NULL)")
+        conn.executemany("INSERT INTO tasks VALUES (?, ?, 'Description', 'Incomplete')", [(1, "Task One"), (2, "Task Two")])
+    conn.close()
+    opr = OpsSQLite(path)
+
+    assert ids(opr.changes(0)) == ["1", "2"]
+    opr.create_task(new_task("Task 3"))
+    assert ids(OpsSQLite(path).changes(0)) == ["1", "2", "3"] # seeded once
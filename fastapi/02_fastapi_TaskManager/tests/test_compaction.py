@@ -0,0 +1,114 @@
+import csv
+import os
+import shutil
+
+import pytest
+
+from opr_csv import OpsCSV
+from schemas import Task
+
+pytestmark = pytest.mark.parametrize("store", ["log"], indirect=True) # the log only exists in log mode
+
+
+def new_task(title):
+    return Task(title=title, description="Description", status="Incomplete")
+
+
+def on_disk():
+    # what a worker starting now reads
+    return [(task.id, task.status) for task in OpsCSV().all()]
+
+
+def rows_of(path):
+    with open(path, newline="") as file:
+        return list(csv.reader(file))[1:]
+
+
+def fill(store):
+    for n in range(1, 5):
+        store.create_task(new_task(f"Task {n}"))
+    store.modify_task("2", {"status": "Ongoing"})
+    store.remove_task("3")
+    return [("1", "Incomplete"), ("2", "Ongoing"), ("4", "Incomplete")]
+
+
+def test_writes_go_to_the_log_and_are_replayed(store, tmp_path):
+    expected = fill(store)
+
+    assert rows_of(tmp_path / "task.csv") == []
+    assert on_disk() == expected
+
+
+def test_compaction_folds_the_log_into_task_csv(store, tmp_path):
+    expected = fill(store)
+
+    store.compact()
+
+    assert not os.path.exists(tmp_path / "task.csv.log.old")
+    assert [(row[0], row[3]) for row in rows_of(tmp_path / "task.csv")] == expected
+    assert on_disk() == expected
+    store.modify_task("1", {"status": "Completed"}) # the next writes go to a fresh log
+    assert on_disk() == [("1", "Completed"), *expected[1:]]
+
+
+def test_old_log_left_by_a_crashed_compaction(store, tmp_path):
+    fill(store)
+    # crash after the log was frozen as .log.old, before task.csv was rewritten
+    os.replace(tmp_path / "task.csv.log", tmp_path / "task.csv.log.old")
+    store.create_task(new_task("Task 5"))
+    store.remove_task("1")
+    expected = [("2", "Ongoing"), ("4", "Incomplete"), ("5", "Incomplete")]
+    assert on_disk() == expected
+
+    store.compact() # the next compaction folds both logs
+
+    assert not os.path.exists(tmp_path / "task.csv.log.old")
+    assert on_disk() == expected
+
+
+def test_compaction_crashing_again_keeps_both_logs(store, tmp_path, monkeypatch):
+    fill(store)
+    os.replace(tmp_path / "task.csv.log", tmp_path / "task.csv.log.old") # first crash
+    store.create_task(new_task("Task 5"))
+    expected = on_disk()
+
+    def crash(tasks):
+        raise OSError("disk full")
+    with monkeypatch.context() as patched, pytest.raises(OSError):
+        patched.setattr(store, "_write_temp", crash)
+        store.compact() # second crash, while task.csv is written
+
+    assert on_disk() == expected
+
+
+def test_old_log_already_in_task_csv_is_harmless(store, tmp_path):
+    expected = fill(store)
+    shutil.copy(tmp_path / "task.csv.log", tmp_path / "frozen")
+    store.compact()
+    # crash between the rename of the new task.csv and the removal of .log.old
+    shutil.copy(tmp_path / "frozen", tmp_path / "task.csv.log.old")
+
+    assert on_disk() == expected
+
+
+def test_back_in_rewrite_mode_the_log_is_folded_first(store, tmp_path, monkeypatch):
+    fill(store)
+    monkeypatch.setattr(OpsCSV, "APPEND_LOG", False)
+
+    OpsCSV().create_task(new_task("Task 5"))
+
+    assert not os.path.exists(tmp_path / "task.csv.log")
+    assert [row[0] for row in rows_of(tmp_path / "task.csv")] == ["1", "2", "4", "5"]
+
+
+def test_compaction_starts_once_the_log_is_mostly_dead(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(OpsCSV, "COMPACT_MIN_RECORDS", 10)
+    for n in range(1, 4):
+        store.create_task(new_task(f"Task {n}"))
+    for _ in range(20):
+        store.modify_task("1", {"status": "Ongoing"})
+    with store._compacting: # the background compaction is done
+        pass
+
+    assert len(rows_of(tmp_path / "task.csv")) == 3
+    assert on_disk() == [("1", "Ongoing"), ("2", "Incomplete"), ("3", "Incomplete")]
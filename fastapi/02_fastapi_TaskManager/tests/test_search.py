@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from schemas import Task, TaskID
+from task_search import TaskSearchIndex, Vocabulary
+
+TASKS = [
+    ("Write docs", "update the README", "Incomplete"),
+    ("Fix login", "password reset fails", "Ongoing"),
+    ("Release", "tag and publish the docs", "Completed"),
+    ("Readme typo", "one word", "Ongoing"),
+]
+
+
+@pytest.fixture
+def tasks(backend):
+    for title, description, status in TASKS:
+        backend.create_task(Task(title=title, description=description, status=status))
+    return backend
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("readme", {"1", "4"}), # in a description, and in a title
+    ("passw", {"2"}), # a description only, as a prefix
+    ("incomplete", {"1"}), # a status only
+    ("Ongoing", {"2", "4"}),
+    ("docs publish", {"3"}),
+    ("title:readme", {"4"}),
+    ("description:readme ongo", set()),
+    ("typo ongo", {"4"}),
+])
+def test_search_looks_in_every_field(tasks, query, expected):
+    # the CSV index and SQLite FTS find the same tasks, the ranking aside
+    assert {task.id for task in tasks.search(query)} == expected
+
+
+def test_vocabulary_stays_sorted_across_blocks(monkeypatch):
+    monkeypatch.setattr(Vocabulary, "BLOCK", 2)
+    words = random.Random(1).sample([f"w{n:03d}" for n in range(300)], 300)
+    vocabulary = Vocabulary()
+    for word in words[:200]:
+        vocabulary.add(word)
+    vocabulary.add_many(set(words[200:210])) # few: one by one
+    vocabulary.add_many(set(words[210:])) # many: merged
+    for word in words[:150]:
+        vocabulary.remove(word)
+
+    assert list(vocabulary) == sorted(words[150:])
+    assert all(len(block) <= 4 for block in vocabulary.blocks)
+    assert vocabulary.lasts == [block[-1] for block in vocabulary.blocks]
+    assert list(vocabulary.starting_at("w25")) == sorted(word for word in words[150:] if word >= "w25")
+
+
+def test_index_follows_updates(monkeypatch):
+    monkeypatch.setattr(Vocabulary, "BLOCK", 2)
+    index = TaskSearchIndex()
+    index.add_many([TaskID(id=str(n), title=f"task {n}", description=f"about topic{n}", status="Incomplete")
+                    for n in range(50)])
+    old = TaskID(id="7", title="task 7", description="about topic7", status="Incomplete")
+    index.remove(old)
+    index.add(old.model_copy(update={"description": "renamed"}))
+
+    assert index.search("topic7") == []
+    assert index.search("renamed") == ["7"]
+    assert index.search("topic4", limit=100) == ["4", *(str(n) for n in range(40, 50))]
@@ -0,0 +1,51 @@
+import csv
+
+from opr_csv import OpsCSV
+from schemas import Task
+
+
+def new_task(title):
+    return Task(title=title, description="Description", status="Incomplete")
+
+
+def add_rows(path, ids):
+    # tasks written before the sequence existed, or by hand
+    with open(path, "a", newline="") as file:
+        csv.writer(file).writerows([id, f"Task {id}", "Description", "Incomplete", "lower"] for id in ids)
+
+
+def test_ids_follow_each_other(store):
+    ids = [store.create_task(new_task(f"Task {n}"))["Created Tasks"].id for n in range(3)]
+    created = store.apply_batch([new_task("Task 4"), new_task("Task 5")], [], [])["create"]
+
+    assert ids + [item["id"] for item in created] == ["1", "2", "3", "4", "5"]
+
+
+def test_missing_sequence_is_seeded_from_the_tasks(store, tmp_path):
+    add_rows(tmp_path / "task.csv", ["1", "7", "3"])
+
+    assert OpsCSV().create_task(new_task("New"))["Created Tasks"].id == "8"
+    assert (tmp_path / "task.csv.seq").read_bytes().strip() == b"%020d" % 8
+
+
+def test_empty_sequence_is_seeded_from_the_tasks(store, tmp_path):
+    add_rows(tmp_path / "task.csv", ["4"])
+    (tmp_path / "task.csv.seq").write_bytes(b"")
+
+    assert OpsCSV().create_task(new_task("New"))["Created Tasks"].id == "5"
+
+
+def test_sequence_behind_the_tasks_is_overtaken(store, tmp_path):
+    store.create_task(new_task("Task 1"))
+    add_rows(tmp_path / "task.csv", ["9"]) # a row added by hand
+
+    assert OpsCSV().create_task(new_task("New"))["Created Tasks"].id == "10"
+
+
+def test_id_of_a_removed_task_is_not_given_again(store):
+    store.create_task(new_task("Task 1"))
+    store.create_task(new_task("Task 2"))
+    store.remove_task("2")
+
+    assert OpsCSV().create_task(new_task("New"))["Created Tasks"].id == "3"
+    assert OpsCSV().last_id() == 3
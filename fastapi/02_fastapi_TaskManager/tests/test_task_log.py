@@ -0,0 +1,59 @@
+import task_log
+from schemas import TaskID
+
+
+def task(id, status="Incomplete"):
+    return TaskID(id=id, title=f"Task {id}", description="Description", status=status, priority="high")
+
+
+def test_read_returns_the_records_after_the_offset(tmp_path):
+    path = str(tmp_path / "task.csv.log")
+    task_log.append(path, [task_log.record(task_log.PUT, task("1"))])
+    rows, offset, ino = task_log.read(path)
+    task_log.append(path, [task_log.record(task_log.PUT, task("2")), task_log.record(task_log.DELETE, task("1"))])
+
+    more, _, _ = task_log.read(path, offset, ino)
+
+    assert rows == [["put", "1", "Task 1", "Description", "Incomplete", "high"]]
+    assert more == [["put", "2", "Task 2", "Description", "Incomplete", "high"], ["del", "1", "", "", "", ""]]
+
+
+def test_read_of_a_replaced_file_is_none(tmp_path):
+    path = str(tmp_path / "task.csv.log")
+    task_log.append(path, [task_log.record(task_log.PUT, task("1"))])
+    _, offset, ino = task_log.read(path)
+    (tmp_path / "task.csv.log").rename(tmp_path / "task.csv.log.old") # compaction
+    task_log.append(path, [task_log.record(task_log.PUT, task("2"))])
+
+    assert task_log.read(path, offset, ino) is None
+
+
+def test_torn_record_is_skipped_then_cut_off(tmp_path):
+    path = tmp_path / "task.csv.log"
+    task_log.append(str(path), [task_log.record(task_log.PUT, task("1"))])
+    with open(path, "ab") as file: # a crash in the middle of an append
+        file.write(b"put,2,Task 2,Desc")
+
+    rows, _, _ = task_log.read(str(path))
+    assert [row[1] for row in rows] == ["1"]
+
+    task_log.append(str(path), [task_log.record(task_log.PUT, task("3"))])
+    rows, _, _ = task_log.read(str(path))
+    assert [row[1] for row in rows] == ["1", "3"]
+
+
+def test_complete_record_without_its_newline_is_kept(tmp_path):
+    path = tmp_path / "task.csv.log"
+    with open(path, "wb") as file:
+        file.write(b"put,1,Task 1,Description,Incomplete,high")
+
+    task_log.append(str(path), [task_log.record(task_log.PUT, task("2"))])
+
+    rows, _, _ = task_log.read(str(path))
+    assert [row[1] for row in rows] == ["1", "2"]
+
+
+def test_records_from_before_the_priority_are_read():
+    rows = task_log.records(b"put,1,Task 1,Description,Incomplete\r\ndel,1,,,\r\n")
+
+    assert rows == [["put", "1", "Task 1", "Description", "Incomplete"], ["del", "1", "", "", ""]]
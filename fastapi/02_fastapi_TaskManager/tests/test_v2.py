@@ -0,0 +1,26 @@
+from schemas import Task, TaskID, TaskV2, TaskV2WithID, task_v2
+
+
+def test_task_v2_keeps_every_field():
+    task = TaskID(id="12", title="Docs", description="Write them", status="Ongoing", priority="high")
+
+    converted = task_v2(task)
+
+    assert converted == TaskV2WithID(id=12, title="Docs", description="Write them", status="Ongoing", priority="high")
+    assert converted.model_dump() == {"title": "Docs", "description": "Write them", "status": "Ongoing",
+                                      "priority": "high", "id": 12}
+
+
+def test_v2_tasks_and_claims(backend):
+    backend.create_task(Task(title="Plain", description="Description", status="Incomplete")) # v1: default priority
+    backend.create_task(TaskV2(title="Urgent", description="Description", status="Incomplete", priority="highest"))
+    backend.create_task(TaskV2(title="Later", description="Description", status="Ongoing", priority="low"))
+
+    assert backend.read_all_tasks_v2() == [
+        TaskV2WithID(id=1, title="Plain", description="Description", status="Incomplete", priority="lower"),
+        TaskV2WithID(id=2, title="Urgent", description="Description", status="Incomplete", priority="highest"),
+        TaskV2WithID(id=3, title="Later", description="Description", status="Ongoing", priority="low"),
+    ]
+    claimed = backend.claim(5)
+    assert [(task.id, task.status) for task in claimed] == [(2, "Ongoing"), (1, "Ongoing")]
+    assert all(type(task) is TaskV2WithID for task in claimed)
@@ -0,0 +1,75 @@
+import csv
+import threading
+
+import pytest
+
+import opr_csv
+from opr_csv import OpsCSV
+from schemas import Task
+
+
+def new_task(title, status="Incomplete"):
+    return Task(title=title, description="Description", status=status)
+
+
+def on_disk():
+    # what a worker starting now reads
+    return [(task.id, task.title, task.status) for task in OpsCSV().all()]
+
+
+def test_writes_are_read_back_by_another_worker(store):
+    for n in range(1, 4):
+        store.create_task(new_task(f"Task {n}"))
+    store.modify_task("2", {"status": "Ongoing"})
+    store.remove_task("1")
+
+    assert on_disk() == [("2", "Task 2", "Ongoing"), ("3", "Task 3", "Incomplete")]
+
+
+def test_failed_rewrite_leaves_task_csv_as_it_was(store, tmp_path, monkeypatch):
+    if OpsCSV.APPEND_LOG:
+        pytest.skip("log mode appends, it does not rewrite task.csv")
+    store.create_task(new_task("Task 1"))
+    before = (tmp_path / "task.csv").read_bytes()
+
+    def crash(*args):
+        raise OSError("disk full")
+    with monkeypatch.context() as patched, pytest.raises(OSError):
+        patched.setattr(opr_csv.os, "replace", crash)
+        store.modify_task("1", {"status": "Ongoing"})
+
+    assert (tmp_path / "task.csv").read_bytes() == before
+    assert not list(tmp_path.glob(".task-*.tmp"))
+    assert store.get_task_by_id("1").status == "Incomplete" # the half changed cache was dropped
+
+
+def test_torn_row_is_cut_off_before_an_append(store, tmp_path):
+    if OpsCSV.APPEND_LOG:
+        pytest.skip("creates go to the log, see test_task_log")
+    store.create_task(new_task("Task 1"))
+    with open(tmp_path / "task.csv", "ab") as file: # a crash in the middle of an append
+        file.write(b"2,Task 2,Descr")
+
+    assert on_disk() == [("1", "Task 1", "Incomplete")]
+
+    store.create_task(new_task("Task 3"))
+
+    with open(tmp_path / "task.csv", newline="") as file:
+        rows = list(csv.reader(file))
+    assert all(len(row) == len(OpsCSV.FIELDS) for row in rows)
+    assert [task[0] for task in on_disk()] == ["1", "2"]
+
+
+def test_concurrent_writes_are_not_lost(store):
+    def create(n):
+        store.create_task(new_task(f"Task {n}"))
+
+    threads = [threading.Thread(target=create, args=(n,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    tasks = on_disk()
+    assert len(tasks) == 20
+    assert sorted(int(id) for id, _, _ in tasks) == list(range(1, 21))